@@ -6,13 +6,24 @@ Uses the new Google Gen AI SDK with Gemini 3 Flash Preview model.
 Documentation: https://ai.google.dev/gemini-api/docs
 """
 
+import io
 import os
-import csv
 import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import itemgetter
 from google import genai
-from google.genai import types
+from google.genai import errors, types
+from gemini_file_cache import upload_cached
 from pathlib import Path
 from dotenv import load_dotenv
+import ijson
+import pandas as pd
+from PyPDF2 import PdfReader
+from PyPDF2.errors import PdfReadError
+# typing.TypedDict can't be used in pydantic schemas before Python 3.12
+from typing_extensions import TypedDict
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +35,26 @@ client = genai.Client(api_key=GEMINI_API_KEY)
 # Model to use - Gemini 3 Flash Preview
 MODEL_NAME = "gemini-3-flash-preview"
 
+# Number of PDFs to send to Gemini concurrently (requests are I/O-bound)
+MAX_WORKERS = 8
+
+# Below this many characters of extracted text the PDF is treated as scanned
+# and uploaded so Gemini can read it with its vision pipeline
+MIN_TEXT_CHARS = 100
+
+# Extracted transactions per PDF, keyed by sha256 of the PDF bytes, prompt
+# and model, so reruns only call Gemini for new or changed statements
+TXN_CACHE_DIR = Path(__file__).parent.parent / ".txn_cache"
+
+
+class Transaction(TypedDict):
+    """Schema Gemini must follow for each extracted transaction."""
+    date: str
+    description: str
+    amount: float
+    category: str
+
+
 EXTRACTION_PROMPT = """
 Extract ALL credit card transactions from this bank statement PDF.
 
@@ -55,115 +86,205 @@ Example output:
 Return ONLY the JSON array, no other text.
 """
 
+EXTRACTION_CONFIG = types.GenerateContentConfig(
+    temperature=0.1,
+    max_output_tokens=65536,  # Large token limit for multi-page statements
+    response_mime_type="application/json",
+    response_schema=list[Transaction],
+)
 
-def try_fix_truncated_json(json_str: str) -> str:
-    """Attempt to fix truncated JSON by closing open brackets."""
-    # Count open brackets
-    open_braces = json_str.count('{') - json_str.count('}')
-    open_brackets = json_str.count('[') - json_str.count(']')
-    
-    # If we're in the middle of a string, try to close it
-    # Find if there's an unclosed string
-    in_string = False
-    escaped = False
-    for char in json_str:
-        if escaped:
-            escaped = False
-            continue
-        if char == '\\':
-            escaped = True
-            continue
-        if char == '"':
-            in_string = not in_string
-    
-    fixed = json_str
-    
-    # Close unclosed string
-    if in_string:
-        fixed += '"'
+# Extraction attempts per PDF; retries back off exponentially (2s, 4s, ...)
+MAX_ATTEMPTS = 3
+RETRYABLE_STATUS_CODES = {429, 503}
+
+# Seconds between status checks while a Batch API job is running, and how
+# long to wait for it before cancelling and falling back to direct requests
+BATCH_POLL_INTERVAL = 30
+BATCH_TIMEOUT = 24 * 60 * 60
+BATCH_DONE_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+# Done states whose inlined responses are worth reading (failed requests
+# carry their own per-response error)
+BATCH_RESULT_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"}
+
+
+def pdf_to_text(pdf_bytes: bytes, pdf_name: str) -> str:
+    """Extract the text layer of a PDF, or an empty string if it can't be read."""
+    try:
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        return "\n".join(page.extract_text() or "" for page in reader.pages).strip()
+    except (PdfReadError, OSError, ValueError) as e:
+        print(f"  Warning: Could not extract text from {pdf_name}: {e}")
+        return ""
+
+
+def upload_pdf(file_path: Path, pdf_bytes: bytes) -> types.Part:
+    """Upload a PDF using the Files API, reusing a cached upload while it is still valid."""
+    return upload_cached(client, pdf_bytes, file_path.name, "application/pdf")
+
+
+def transaction_cache_path(pdf_bytes: bytes) -> Path:
+    """Return the cache file for a PDF's extracted transactions."""
+    digest = hashlib.sha256(pdf_bytes)
+    digest.update(EXTRACTION_PROMPT.encode("utf-8"))
+    digest.update(MODEL_NAME.encode("utf-8"))
+    return TXN_CACHE_DIR / f"{digest.hexdigest()}.json"
+
+
+def load_cached_transactions(pdf_bytes: bytes) -> list[dict] | None:
+    """Load previously extracted transactions for a PDF, if cached."""
+    cache_path = transaction_cache_path(pdf_bytes)
+    if not cache_path.exists():
+        return None
+    try:
+        return json.loads(cache_path.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return None
+
+
+def save_cached_transactions(pdf_bytes: bytes, transactions: list[dict]):
+    """Cache a PDF's extracted transactions."""
+    TXN_CACHE_DIR.mkdir(exist_ok=True)
+    transaction_cache_path(pdf_bytes).write_text(json.dumps(transactions), encoding="utf-8")
+
+
+def build_request_contents(file_path: Path, pdf_bytes: bytes) -> list:
+    """Build the Gemini request contents for a statement PDF."""
+    # Chase statements are born-digital, so send the text layer as plain text
+    # and skip Gemini's page-rendering vision pipeline
+    statement_text = pdf_to_text(pdf_bytes, file_path.name)
+    if len(statement_text) >= MIN_TEXT_CHARS:
+        return [EXTRACTION_PROMPT + "\n\n---STATEMENT---\n" + statement_text]
     
-    # Remove trailing comma if present after the last complete value
-    fixed = fixed.rstrip()
-    if fixed.endswith(','):
-        fixed = fixed[:-1]
+    # Scanned PDF - upload it using the Files API instead
+    return [upload_pdf(file_path, pdf_bytes), EXTRACTION_PROMPT]
+
+
+def extract_transactions_from_pdf(pdf_path: str, pdf_bytes: bytes | None = None) -> list[dict]:
+    """Extract transactions from a single PDF using Gemini (pdf_bytes, if given, saves re-reading it)."""
+    print(f"Processing: {pdf_path}")
+    if pdf_bytes is None:
+        pdf_bytes = Path(pdf_path).read_bytes()
     
-    # Close any open braces
-    fixed += '}' * open_braces
+    # Built once so retries reuse the same text or uploaded file
+    contents = build_request_contents(Path(pdf_path), pdf_bytes)
     
-    # Close any open brackets
-    fixed += ']' * open_brackets
+    for attempt in range(MAX_ATTEMPTS):
+        if attempt:
+            time.sleep(2 ** attempt)
+        
+        # Parse array items as chunks arrive instead of buffering the whole response
+        transactions = []
+        parsed = ijson.sendable_list()
+        parser = ijson.items_coro(parsed, "item", use_float=True)
+        try:
+            stream = client.models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=contents,
+                config=EXTRACTION_CONFIG,
+            )
+            for chunk in stream:
+                if chunk.text:
+                    parser.send(chunk.text.encode("utf-8"))
+                    transactions.extend(parsed)
+                    del parsed[:]
+            parser.close()
+            transactions.extend(parsed)
+        except errors.APIError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt == MAX_ATTEMPTS - 1:
+                raise
+            print(f"  Warning: Gemini returned {e.code}, retrying extraction...")
+            continue
+        except ijson.JSONError as e:
+            # Output was cut off (e.g. at max_output_tokens) - keep what was parsed
+            transactions.extend(parsed)
+            if transactions:
+                print(f"  Warning: Response was truncated, keeping {len(transactions)} complete transactions")
+                break
+            if attempt == MAX_ATTEMPTS - 1:
+                print(f"  Error parsing response: {e}")
+                return []
+            print(f"  Warning: Could not parse response, retrying extraction...")
+            continue
+        
+        save_cached_transactions(pdf_bytes, transactions)
+        break
     
-    return fixed
+    print(f"  Found {len(transactions)} transactions")
+    return transactions
 
 
-def extract_transactions_from_pdf(pdf_path: str, retry_count: int = 0) -> list[dict]:
-    """Extract transactions from a single PDF using Gemini."""
-    print(f"Processing: {pdf_path}")
-    
-    # Read the PDF file
-    file_path = Path(pdf_path)
+def extract_transactions_batch(pdf_paths: list[Path], pdf_contents: list[bytes]) -> list[list[dict] | None]:
+    """Extract transactions from several PDFs (paths and their bytes) with a single Gemini Batch API job.
     
-    # Upload the PDF using the Files API
-    uploaded_file = client.files.upload(file=file_path)
+    Returns one transaction list per PDF, in order, with None for any PDF
+    the batch did not produce a usable result for.
+    """
+    requests = [
+        {"contents": build_request_contents(pdf_path, pdf_bytes), "config": EXTRACTION_CONFIG}
+        for pdf_path, pdf_bytes in zip(pdf_paths, pdf_contents)
+    ]
     
-    # Generate content with the PDF
-    response = client.models.generate_content(
+    batch_job = client.batches.create(
         model=MODEL_NAME,
-        contents=[uploaded_file, EXTRACTION_PROMPT],
-        config=types.GenerateContentConfig(
-            temperature=0.1,
-            max_output_tokens=65536,  # Large token limit for multi-page statements
-        )
+        src=requests,
+        config={"display_name": "chase-statement-extraction"},
     )
+    print(f"Submitted batch job {batch_job.name} for {len(requests)} PDFs")
     
-    # Parse the response
-    response_text = response.text.strip()
+    deadline = time.monotonic() + BATCH_TIMEOUT
+    while batch_job.state.name not in BATCH_DONE_STATES:
+        if time.monotonic() >= deadline:
+            print(f"Warning: Batch job still {batch_job.state.name} after {BATCH_TIMEOUT // 3600} hours, cancelling")
+            client.batches.cancel(name=batch_job.name)
+            return [None] * len(pdf_paths)
+        time.sleep(BATCH_POLL_INTERVAL)
+        batch_job = client.batches.get(name=batch_job.name)
+        print(f"  Batch job state: {batch_job.state.name}")
     
-    # Clean up the response - remove markdown code blocks if present
-    if response_text.startswith("```"):
-        lines = response_text.split("\n")
-        # Remove first line (```json) and last line (```)
-        if lines[-1].strip() == "```":
-            response_text = "\n".join(lines[1:-1])
-        else:
-            response_text = "\n".join(lines[1:])
+    if batch_job.state.name not in BATCH_RESULT_STATES:
+        print(f"Warning: Batch job ended in {batch_job.state.name}")
+        return [None] * len(pdf_paths)
     
-    # Also handle if ``` is at the end without newline
-    if response_text.endswith("```"):
-        response_text = response_text[:-3]
-    
-    try:
-        transactions = json.loads(response_text)
-        print(f"  Found {len(transactions)} transactions")
-        return transactions
-    except json.JSONDecodeError as e:
-        print(f"  Warning: JSON parsing issue, attempting to fix...")
+    # Inlined responses come back in request order
+    results = []
+    for pdf_path, pdf_bytes, inlined in zip(pdf_paths, pdf_contents, batch_job.dest.inlined_responses):
+        if inlined.error or not inlined.response or not inlined.response.text:
+            print(f"  Warning: No batch result for {pdf_path.name}")
+            results.append(None)
+            continue
         
-        # Try to fix truncated JSON
         try:
-            fixed_json = try_fix_truncated_json(response_text)
-            transactions = json.loads(fixed_json)
-            print(f"  Fixed! Found {len(transactions)} transactions")
-            return transactions
+            transactions = json.loads(inlined.response.text)
         except json.JSONDecodeError:
-            pass
-        
-        # Retry once if we haven't already
-        if retry_count < 1:
-            print(f"  Retrying extraction...")
-            return extract_transactions_from_pdf(pdf_path, retry_count + 1)
+            print(f"  Warning: Could not parse batch result for {pdf_path.name}")
+            results.append(None)
+            continue
         
-        print(f"  Error parsing JSON: {e}")
-        print(f"  Response was: {response_text[:500]}...")
-        return []
+        print(f"  {pdf_path.name}: Found {len(transactions)} transactions")
+        save_cached_transactions(pdf_bytes, transactions)
+        results.append(transactions)
+    
+    return results
 
 
-def process_all_pdfs(base_dir: str) -> list[dict]:
-    """Process all Chase PDFs and return combined transactions."""
+def process_all_pdfs(base_dir: str, use_batch: bool = False) -> list[dict]:
+    """Process all Chase PDFs and return combined transactions.
+    
+    PDFs are sent as concurrent requests, or as one Batch API job when
+    use_batch is set (cheaper, but the job can take a long time to finish).
+    """
     all_transactions = []
     
     pdf_folders = ["PDF/2040", "PDF/7557"]
     
+    # Collect (card_suffix, pdf_file) pairs from every folder
+    tasks = []
     for folder in pdf_folders:
         folder_path = Path(base_dir) / folder
         if not folder_path.exists():
@@ -173,14 +294,65 @@ def process_all_pdfs(base_dir: str) -> list[dict]:
         card_suffix = folder.split("/")[1]  # "2040" or "7557"
         
         for pdf_file in sorted(folder_path.glob("*.pdf")):
-            transactions = extract_transactions_from_pdf(str(pdf_file))
-            
-            # Add card identifier and source to each transaction
-            for txn in transactions:
-                txn["card"] = f"Chase-{card_suffix}"
-                txn["source"] = pdf_file.name
+            tasks.append((card_suffix, pdf_file))
+    
+    if not tasks:
+        return all_transactions
+    
+    # (card_suffix, pdf_file, transactions) for every finished PDF
+    completed = []
+    pending = []
+    
+    # Reuse transactions already extracted from unchanged PDFs; each PDF is
+    # read once, and its bytes reused for the extraction and any upload
+    for card_suffix, pdf_file in tasks:
+        pdf_bytes = pdf_file.read_bytes()
+        cached = load_cached_transactions(pdf_bytes)
+        if cached is not None:
+            print(f"Using cached transactions for {pdf_file.name}")
+            completed.append((card_suffix, pdf_file, cached))
+        else:
+            pending.append((card_suffix, pdf_file, pdf_bytes))
+    
+    if use_batch and pending:
+        batch_tasks = pending
+        try:
+            batch_results = extract_transactions_batch(
+                [pdf_file for _, pdf_file, _ in batch_tasks], [pdf_bytes for _, _, pdf_bytes in batch_tasks]
+            )
+        except errors.APIError as e:
+            print(f"Warning: Batch job failed ({e})")
+            batch_results = [None] * len(batch_tasks)
+        
+        completed.extend(
+            (card_suffix, pdf_file, transactions)
+            for (card_suffix, pdf_file, _), transactions in zip(batch_tasks, batch_results)
+            if transactions is not None
+        )
+        pending = [task for task, transactions in zip(batch_tasks, batch_results) if transactions is None]
+        if pending:
+            print(f"Falling back to direct requests for {len(pending)} PDFs")
+    
+    if pending:
+        # Gemini calls are network-bound, so threads overlap the round-trips
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pending))) as executor:
+            futures = {
+                executor.submit(extract_transactions_from_pdf, str(pdf_file), pdf_bytes): (card_suffix, pdf_file)
+                for card_suffix, pdf_file, pdf_bytes in pending
+            }
             
-            all_transactions.extend(transactions)
+            for future in as_completed(futures):
+                card_suffix, pdf_file = futures[future]
+                completed.append((card_suffix, pdf_file, future.result()))
+    
+    for card_suffix, pdf_file, transactions in completed:
+        # Add card identifier and source to each transaction
+        for txn in transactions:
+            txn.setdefault("date", "")
+            txn["card"] = f"Chase-{card_suffix}"
+            txn["source"] = pdf_file.name
+        
+        all_transactions.extend(transactions)
     
     return all_transactions
 
@@ -192,20 +364,24 @@ def save_to_csv(transactions: list[dict], output_path: str):
         return
     
     # Sort by date
-    transactions.sort(key=lambda x: x.get("date", ""))
+    transactions.sort(key=itemgetter("date"))
     
     fieldnames = ["date", "description", "amount", "category", "card", "source"]
     
-    with open(output_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(transactions)
+    pd.DataFrame(transactions, columns=fieldnames).to_csv(output_path, index=False, encoding="utf-8")
     
     print(f"Saved {len(transactions)} transactions to {output_path}")
 
 
-def main():
+def main(argv: list[str] | None = None):
     """Main function to extract Chase transactions."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Extract Chase transactions from PDF statements")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all PDFs as one discounted Gemini Batch API job")
+    args = parser.parse_args(argv)
+    
     base_dir = Path(__file__).parent.parent
     output_dir = base_dir / "csv"
     output_dir.mkdir(exist_ok=True)
@@ -215,7 +391,7 @@ def main():
     print("=" * 60)
     
     # Process all PDFs
-    transactions = process_all_pdfs(str(base_dir))
+    transactions = process_all_pdfs(str(base_dir), use_batch=args.batch)
     
     # Save to CSV
     output_path = output_dir / "Chase_Extracted_Transactions.csv"
@@ -3,39 +3,76 @@ Gemini Financial Advisor - Analyzes expense charts and provides personalized adv
 Uses Google Gemini API to review spending patterns and create a survival budget plan.
 """
 
+import io
 import os
-import base64
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from google import genai
 from google.genai import types
+from gemini_file_cache import upload_cached
 import pandas as pd
-from dotenv import load_dotenv
+from dotenv import dotenv_values, load_dotenv
+from PIL import Image
 
 
-def encode_image(image_path: str) -> str:
-    """Encode image to base64."""
-    with open(image_path, "rb") as f:
-        return base64.standard_b64encode(f.read()).decode("utf-8")
+# Project paths, resolved once at import
+BASE_DIR = Path(__file__).resolve().parent.parent
+CSV_PATH = BASE_DIR / "csv" / "All_Transactions_Merged.csv"
+CHARTS_DIR = BASE_DIR / "overall_diagrams"
+ENV_PATH = BASE_DIR / ".env"
+OUTPUT_PATH = BASE_DIR / "financial_advice.md"
+
+# Charts are downsampled to fit this size (px) before being sent to Gemini
+CHART_MAX_SIZE = 768
+
+
+def compress_chart(chart_path: Path) -> bytes:
+    """Downsample a chart and re-encode it as WebP, caching the result next to the source PNG."""
+    compressed_path = chart_path.with_name(f".{chart_path.stem}_compressed.webp")
+    if compressed_path.exists() and compressed_path.stat().st_mtime >= chart_path.stat().st_mtime:
+        return compressed_path.read_bytes()
+    
+    with Image.open(chart_path) as img:
+        img = img.convert("RGB")
+    img.thumbnail((CHART_MAX_SIZE, CHART_MAX_SIZE), Image.LANCZOS)
+    
+    # Lossy WebP compresses anti-aliased chart graphics far better than PNG
+    buf = io.BytesIO()
+    img.save(buf, format="WEBP", quality=80, method=6)
+    compressed_path.write_bytes(buf.getvalue())
+    return buf.getvalue()
+
+
+def upload_chart(client: genai.Client, chart_path: Path) -> types.Part:
+    """Upload a compressed chart using the Files API, reusing a cached upload while it is still valid."""
+    return upload_cached(client, compress_chart(chart_path), chart_path.name, "image/webp")
 
 
 def load_transaction_summary(csv_path: str) -> dict:
     """Load and summarize transaction data."""
-    df = pd.read_csv(csv_path)
-    df["date"] = pd.to_datetime(df["date"])
+    # Parse and type the columns in a single Arrow-backed pass
+    df = pd.read_csv(
+        csv_path,
+        engine="pyarrow",
+        dtype_backend="pyarrow",
+        dtype={"label": "category"},
+        parse_dates=["date"],
+    )
     
     # Calculate key metrics
     total_spending = df["amount"].sum()
-    months_covered = (df["date"].max() - df["date"].min()).days / 30
-    monthly_avg = total_spending / max(months_covered, 1)
+    date_min, date_max = df["date"].agg(["min", "max"])
+    months_covered = (date_max - date_min).days / 30
+    months_divisor = max(months_covered, 1)
+    monthly_avg = total_spending / months_divisor
     
     # Category breakdown
-    category_totals = df.groupby("label")["amount"].sum().sort_values(ascending=False)
-    
-    # Top spending categories
-    top_categories = category_totals.head(15).to_dict()
+    category_totals = df.groupby("label", observed=True)["amount"].sum().sort_values(ascending=False)
     
-    # Calculate monthly averages for key categories
-    monthly_category_avg = {cat: amt / max(months_covered, 1) for cat, amt in top_categories.items()}
+    # Top spending categories and their monthly averages
+    top_totals = category_totals.head(15)
+    top_categories = top_totals.to_dict()
+    monthly_category_avg = (top_totals / months_divisor).to_dict()
     
     return {
         "total_spending": total_spending,
@@ -44,38 +81,29 @@ def load_transaction_summary(csv_path: str) -> dict:
         "top_categories": top_categories,
         "monthly_category_avg": monthly_category_avg,
         "transaction_count": len(df),
-        "date_range": f"{df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}"
+        "date_range": f"{date_min.strftime('%Y-%m-%d')} to {date_max.strftime('%Y-%m-%d')}"
     }
 
 
 def get_financial_advice(income: float = 900, rent: float = 450):
     """Get personalized financial advice from Gemini based on spending analysis."""
     
-    base_dir = Path(__file__).parent.parent
-    csv_path = base_dir / "csv" / "All_Transactions_Merged.csv"
-    charts_dir = base_dir / "overall_diagrams"
-    
     # Load transaction summary
     print("Loading transaction data...")
-    summary = load_transaction_summary(str(csv_path))
+    summary = load_transaction_summary(str(CSV_PATH))
     
     # Collect all chart images
     print("Loading expense charts...")
-    chart_files = list(charts_dir.glob("*.png"))
     
     # Initialize Gemini client
     # Load from .env file
-    load_dotenv(base_dir / ".env")
+    load_dotenv(ENV_PATH)
     api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GEMINI_API")
     if not api_key:
-        # Try reading directly from .env file
-        env_file = base_dir / ".env"
-        if env_file.exists():
-            with open(env_file) as f:
-                for line in f:
-                    if line.startswith("GEMINI_API"):
-                        api_key = line.split("=")[1].strip()
-                        break
+        # Read the .env file directly (load_dotenv won't override variables
+        # that are already set, even if they are empty)
+        env_values = dotenv_values(ENV_PATH)
+        api_key = env_values.get("GEMINI_API_KEY") or env_values.get("GEMINI_API")
     
     if not api_key:
         raise ValueError("GEMINI_API_KEY not found in environment or .env file")
@@ -103,9 +131,11 @@ Based on the attached expense charts and transaction data:
 ### Top Spending Categories (Total & Monthly Average):
 """
     
-    for cat, total in summary['top_categories'].items():
-        monthly = summary['monthly_category_avg'][cat]
-        prompt += f"- **{cat}:** ${total:.2f} total (${monthly:.2f}/month avg)\n"
+    category_lines = [
+        f"- **{cat}:** ${total:.2f} total (${summary['monthly_category_avg'][cat]:.2f}/month avg)"
+        for cat, total in summary['top_categories'].items()
+    ]
+    prompt += "\n".join(category_lines) + "\n"
     
     prompt += f"""
 
@@ -164,17 +194,21 @@ Be direct, specific, and reference actual numbers from my spending data. Don't s
         "Summary_Dashboard.png"
     ]
     
+    # One directory read instead of a stat() per chart
+    available = set()
+    if CHARTS_DIR.is_dir():
+        with os.scandir(CHARTS_DIR) as entries:
+            available = {entry.name for entry in entries if entry.is_file()}
+    chart_paths = []
     for chart_name in priority_charts:
-        chart_path = charts_dir / chart_name
-        if chart_path.exists():
+        if chart_name in available:
             print(f"  Adding chart: {chart_name}")
-            image_data = encode_image(str(chart_path))
-            content_parts.append(
-                types.Part.from_bytes(
-                    data=base64.standard_b64decode(image_data),
-                    mime_type="image/png"
-                )
-            )
+            chart_paths.append(CHARTS_DIR / chart_name)
+    
+    # Upload charts concurrently via the Files API and reference them by URI
+    if chart_paths:
+        with ThreadPoolExecutor(max_workers=len(chart_paths)) as executor:
+            content_parts.extend(executor.map(lambda path: upload_chart(client, path), chart_paths))
     
     print("\nConsulting Gemini Financial Advisor...")
     print("=" * 60)
@@ -200,8 +234,7 @@ Be direct, specific, and reference actual numbers from my spending data. Don't s
     print(advice)
     
     # Save the advice to a file
-    output_path = base_dir / "financial_advice.md"
-    with open(output_path, "w") as f:
+    with open(OUTPUT_PATH, "w") as f:
         f.write(f"# Financial Advisor Report\n\n")
         f.write(f"**Generated:** {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}\n\n")
         f.write(f"## Budget Overview\n")
@@ -212,7 +245,7 @@ Be direct, specific, and reference actual numbers from my spending data. Don't s
         f.write(advice)
     
     print(f"\n{'=' * 60}")
-    print(f"📄 Full report saved to: {output_path}")
+    print(f"📄 Full report saved to: {OUTPUT_PATH}")
     print("=" * 60)
     
     return advice
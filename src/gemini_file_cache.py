@@ -0,0 +1,69 @@
+"""
+Shared cache of files uploaded to the Gemini Files API.
+Used by the PDF extraction step and the financial advisor, so reruns reuse
+uploads until the Files API expires them (48 hours after upload).
+"""
+
+import io
+import json
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from google import genai
+from google.genai import errors, types
+
+
+# Sidecar mapping sha256(file bytes) -> uploaded Gemini file
+FILE_CACHE_PATH = Path(__file__).resolve().parent.parent / ".gemini_file_cache.json"
+
+# Guards the read-modify-write of the sidecar across upload threads
+_file_cache_lock = threading.Lock()
+
+
+def load_file_cache() -> dict:
+    """Load the uploaded-file cache sidecar."""
+    if not FILE_CACHE_PATH.exists():
+        return {}
+    try:
+        return json.loads(FILE_CACHE_PATH.read_text(encoding="utf-8"))
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def upload_cached(client: genai.Client, data: bytes, display_name: str, mime_type: str) -> types.Part:
+    """Upload file bytes using the Files API, reusing a cached upload while it is still valid."""
+    file_hash = hashlib.sha256(data).hexdigest()
+    
+    with _file_cache_lock:
+        entry = load_file_cache().get(file_hash)
+    
+    # Leave a small margin so the file doesn't expire mid-request
+    if entry and datetime.fromisoformat(entry["expiry"]) > datetime.now(timezone.utc) + timedelta(minutes=5):
+        try:
+            client.files.get(name=entry["name"])
+            print(f"  Reusing uploaded file: {entry['name']}")
+            return types.Part.from_uri(file_uri=entry["uri"], mime_type=entry["mime_type"])
+        except errors.ClientError:
+            pass  # Deleted or expired server-side, upload again
+    
+    uploaded_file = client.files.upload(
+        file=io.BytesIO(data),
+        config=types.UploadFileConfig(display_name=display_name, mime_type=mime_type),
+    )
+    expiry = uploaded_file.expiration_time or datetime.now(timezone.utc) + timedelta(hours=48)
+    mime_type = uploaded_file.mime_type or mime_type
+    
+    # Re-read under the lock so concurrent uploads (and the other script's
+    # entries) aren't lost
+    with _file_cache_lock:
+        cache = load_file_cache()
+        cache[file_hash] = {
+            "name": uploaded_file.name,
+            "uri": uploaded_file.uri,
+            "mime_type": mime_type,
+            "expiry": expiry.isoformat(),
+        }
+        FILE_CACHE_PATH.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+    
+    return types.Part.from_uri(file_uri=uploaded_file.uri, mime_type=mime_type)
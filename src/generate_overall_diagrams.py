@@ -4,34 +4,89 @@ Creates visualizations for spending patterns, categories, and trends.
 """
 
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # Render straight to files, no GUI backend
 import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from matplotlib.figure import Figure
 import seaborn as sns
 import numpy as np
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime
 
 
-# Set style
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette("husl")
+# Typed Parquet copy of the merged CSV, reused while it is newer than both the
+# CSV and this script (so changes to load_transactions invalidate it)
+PARQUET_CACHE_SUFFIX = ".overall.parquet"
+
+# Output resolution; the denser summary dashboard keeps the higher DPI
+CHART_DPI = 100
+DASHBOARD_DPI = 150
+
+# Day names indexed by pandas' dayofweek (Monday=0)
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+
+# Fast zlib level for the PNGs; chart images barely shrink at higher levels
+PNG_OPTIONS = {"compress_level": 1, "optimize": False}
+
+# Chart style and color cycle, applied only while a chart is drawn so
+# importing this module leaves the global rcParams untouched
+CHART_STYLE = ['seaborn-v0_8-whitegrid', {"axes.prop_cycle": plt.cycler(color=sns.color_palette("husl"))}]
 
 
 def load_transactions(csv_path: str) -> pd.DataFrame:
-    """Load merged transactions CSV."""
-    df = pd.read_csv(csv_path)
-    df["date"] = pd.to_datetime(df["date"])
+    """Load merged transactions CSV, reusing the Parquet cache when it is current."""
+    cache_path = Path(csv_path).with_suffix(PARQUET_CACHE_SUFFIX)
+    inputs_mtime = max(Path(csv_path).stat().st_mtime, Path(__file__).stat().st_mtime)
+    if cache_path.exists() and cache_path.stat().st_mtime >= inputs_mtime:
+        return pd.read_parquet(cache_path)
+    
+    # Parse dates and type the columns in the read itself; amounts stay
+    # float64 so the reported totals are exact to the cent
+    df = pd.read_csv(
+        csv_path,
+        dtype={"amount": "float64", "label": "category", "card": "category"},
+        parse_dates=["date"],
+        cache_dates=True,
+    )
     df["month"] = df["date"].dt.to_period("M")
     df["week"] = df["date"].dt.isocalendar().week
-    df["day_of_week"] = df["date"].dt.day_name()
+    df["dow"] = df["date"].dt.dayofweek.astype("int8")
+    
+    df.to_parquet(cache_path, compression="zstd")
     return df
 
 
-def create_monthly_spending_chart(df: pd.DataFrame, output_dir: Path):
+@lru_cache(maxsize=64)
+def palette(name: str, n: int, lo: float = 0.0, hi: float = 1.0) -> np.ndarray:
+    """Return n colors sampled evenly from a colormap between lo and hi."""
+    return plt.get_cmap(name)(np.linspace(lo, hi, n))
+
+
+def plot_histogram(ax, values: pd.Series, bins: int, **bar_kwargs):
+    """Bin values with np.histogram and draw the counts as bars."""
+    counts, edges = np.histogram(values.to_numpy(), bins=bins)
+    return ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', **bar_kwargs)
+
+
+def rotate_x_labels(ax):
+    """Slant an axis' x tick labels 45 degrees, right-aligned to their ticks."""
+    for tick_label in ax.get_xticklabels():
+        tick_label.set_rotation(45)
+        tick_label.set_ha('right')
+
+
+def label_mask(df: pd.DataFrame, labels: list[str]) -> np.ndarray:
+    """Return a row mask for the given labels by matching categorical codes."""
+    codes = df["label"].cat.categories.get_indexer(labels)
+    return np.isin(df["label"].cat.codes.to_numpy(), codes[codes >= 0])
+
+
+@plt.style.context(CHART_STYLE)
+def create_monthly_spending_chart(monthly: pd.Series, output_dir: Path):
     """Create monthly spending trends chart."""
-    monthly = df.groupby(df["date"].dt.to_period("M"))["amount"].sum()
-    
-    fig, ax = plt.subplots(figsize=(14, 6))
+    fig = Figure(figsize=(14, 6), layout="constrained")
+    ax = fig.subplots()
     
     x_labels = [str(m) for m in monthly.index]
     bars = ax.bar(x_labels, monthly.values, color='steelblue', alpha=0.7, edgecolor='navy')
@@ -40,40 +95,36 @@ def create_monthly_spending_chart(df: pd.DataFrame, output_dir: Path):
     ax.set_xlabel("Month")
     ax.set_ylabel("Total Spending ($)")
     ax.set_title("Monthly Spending Trends - 2025", fontsize=14, fontweight='bold')
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax)
     
     # Add value labels
-    for bar, val in zip(bars, monthly.values):
-        ax.text(bar.get_x() + bar.get_width()/2, val + 10, f'${val:.0f}', 
-                ha='center', va='bottom', fontsize=9)
+    ax.bar_label(bars, fmt='$%.0f', padding=3, fontsize=9)
     
     # Add average line
     avg = monthly.mean()
     ax.axhline(y=avg, color='red', linestyle='--', label=f'Average: ${avg:.2f}')
     ax.legend()
     
-    plt.tight_layout()
     output_path = output_dir / "Monthly_Spending_Trends.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
-def create_category_breakdown(df: pd.DataFrame, output_dir: Path):
+@plt.style.context(CHART_STYLE)
+def create_category_breakdown(label_totals: pd.Series, output_dir: Path):
     """Create spending by category pie chart."""
-    category_totals = df.groupby("label")["amount"].sum().sort_values(ascending=False)
-    
     # Get top 10 categories, group rest as "Other"
-    top_10 = category_totals.head(10)
-    other = category_totals[10:].sum()
+    top_10 = label_totals.head(10)
+    other = label_totals[10:].sum()
     if other > 0:
         top_10["Other Categories"] = other
     
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
+    fig = Figure(figsize=(16, 8), layout="constrained")
+    ax1, ax2 = fig.subplots(1, 2)
     fig.suptitle("Spending by Category", fontsize=16, fontweight='bold')
     
     # Pie chart
-    colors = plt.cm.Set3(np.linspace(0, 1, len(top_10)))
+    colors = palette("Set3", len(top_10))
     wedges, texts, autotexts = ax1.pie(
         top_10.values,
         labels=None,
@@ -96,23 +147,23 @@ def create_category_breakdown(df: pd.DataFrame, output_dir: Path):
     ax2.set_xlabel("Amount ($)")
     ax2.set_title("Top Categories by Spending")
     
-    for bar, val in zip(bars, top_10_sorted.values):
-        ax2.text(val + 5, bar.get_y() + bar.get_height()/2, f'${val:.2f}', 
-                va='center', fontsize=9)
+    ax2.bar_label(bars, fmt='$%.2f', padding=3, fontsize=9)
     
-    plt.tight_layout()
     output_path = output_dir / "Category_Breakdown.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
+@plt.style.context(CHART_STYLE)
 def create_card_spending_chart(df: pd.DataFrame, output_dir: Path):
     """Create spending by card chart."""
-    card_totals = df.groupby("card")["amount"].sum().sort_values(ascending=False)
-    card_counts = df.groupby("card").size()
+    # Sum and count in one pass over the amounts
+    card_stats = df.groupby("card", observed=True, sort=False)["amount"].agg(["sum", "size"])
+    card_totals = card_stats["sum"].sort_values(ascending=False)
+    card_counts = card_stats["size"].sort_index()
     
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    fig = Figure(figsize=(14, 6), layout="constrained")
+    ax1, ax2 = fig.subplots(1, 2)
     fig.suptitle("Spending by Credit Card", fontsize=16, fontweight='bold')
     
     # Total spending by card
@@ -120,31 +171,24 @@ def create_card_spending_chart(df: pd.DataFrame, output_dir: Path):
     bars1 = ax1.bar(card_totals.index, card_totals.values, color=colors)
     ax1.set_ylabel("Total Spending ($)")
     ax1.set_title("Total Amount")
-    plt.sca(ax1)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax1)
     
-    for bar, val in zip(bars1, card_totals.values):
-        ax1.text(bar.get_x() + bar.get_width()/2, val + 10, f'${val:.0f}', 
-                ha='center', va='bottom', fontsize=10)
+    ax1.bar_label(bars1, fmt='$%.0f', padding=3, fontsize=10)
     
     # Transaction count by card
     bars2 = ax2.bar(card_counts.index, card_counts.values, color=colors)
     ax2.set_ylabel("Number of Transactions")
     ax2.set_title("Transaction Count")
-    plt.sca(ax2)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax2)
     
-    for bar, val in zip(bars2, card_counts.values):
-        ax2.text(bar.get_x() + bar.get_width()/2, val + 2, str(val), 
-                ha='center', va='bottom', fontsize=10)
+    ax2.bar_label(bars2, fmt='%d', padding=3, fontsize=10)
     
-    plt.tight_layout()
     output_path = output_dir / "Card_Spending.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
+@plt.style.context(CHART_STYLE)
 def create_restaurant_breakdown(df: pd.DataFrame, output_dir: Path):
     """Create restaurant/food spending breakdown."""
     # Filter for food-related labels
@@ -157,30 +201,29 @@ def create_restaurant_breakdown(df: pd.DataFrame, output_dir: Path):
         "Dave's Dark Horse", "Dining", "Restaurants"
     ]
     
-    food_df = df[df["label"].isin(food_labels)]
-    food_totals = food_df.groupby("label")["amount"].sum().sort_values(ascending=False)
+    food_df = df[label_mask(df, food_labels)]
+    food_totals = food_df.groupby("label", observed=True, sort=False)["amount"].sum().sort_values(ascending=False)
     
     if food_totals.empty:
         print("No restaurant data to plot")
         return
     
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
+    fig = Figure(figsize=(16, 8), layout="constrained")
+    ax1, ax2 = fig.subplots(1, 2)
     fig.suptitle(f"Restaurant & Food Spending Analysis\nTotal: ${food_totals.sum():.2f}", 
                  fontsize=16, fontweight='bold')
     
     # Horizontal bar chart
-    colors = plt.cm.Spectral(np.linspace(0, 1, len(food_totals)))
+    colors = palette("Spectral", len(food_totals))
     bars = ax1.barh(food_totals.index, food_totals.values, color=colors)
     ax1.set_xlabel("Amount ($)")
     ax1.set_title("Spending by Restaurant/Service")
     
-    for bar, val in zip(bars, food_totals.values):
-        ax1.text(val + 1, bar.get_y() + bar.get_height()/2, f'${val:.2f}', 
-                va='center', fontsize=9)
+    ax1.bar_label(bars, fmt='$%.2f', padding=3, fontsize=9)
     
     # Pie chart for delivery vs dine-in
     delivery_labels = ["DoorDash", "Grubhub", "Uber Eats"]
-    delivery_total = food_df[food_df["label"].isin(delivery_labels)]["amount"].sum()
+    delivery_total = food_df.loc[label_mask(food_df, delivery_labels), "amount"].sum()
     other_total = food_totals.sum() - delivery_total
     
     ax2.pie([delivery_total, other_total], 
@@ -191,38 +234,37 @@ def create_restaurant_breakdown(df: pd.DataFrame, output_dir: Path):
             explode=(0.05, 0))
     ax2.set_title("Delivery vs Other Food")
     
-    plt.tight_layout()
     output_path = output_dir / "Restaurant_Breakdown.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
+@plt.style.context(CHART_STYLE)
 def create_gas_station_analysis(df: pd.DataFrame, output_dir: Path):
     """Create gas station spending analysis."""
-    gas_df = df[df["label"].isin(["Gas Station Indiscretion", "Gasoline"])]
+    gas_df = df[label_mask(df, ["Gas Station Indiscretion", "Gasoline"])]
     
     if gas_df.empty:
         print("No gas station data to plot")
         return
     
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    fig = Figure(figsize=(14, 10), layout="constrained")
+    axes = fig.subplots(2, 2)
     fig.suptitle(f"Gas Station Spending Analysis\nTotal: ${gas_df['amount'].sum():.2f}", 
                  fontsize=16, fontweight='bold')
     
     # Monthly gas spending
     ax1 = axes[0, 0]
-    monthly_gas = gas_df.groupby(gas_df["date"].dt.to_period("M"))["amount"].sum()
+    monthly_gas = gas_df.groupby("month")["amount"].sum()
     ax1.bar([str(m) for m in monthly_gas.index], monthly_gas.values, color='orange', alpha=0.7)
     ax1.set_xlabel("Month")
     ax1.set_ylabel("Amount ($)")
     ax1.set_title("Monthly Gas Station Spending")
-    plt.sca(ax1)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax1)
     
     # Indiscretion vs Actual Gas
     ax2 = axes[0, 1]
-    label_totals = gas_df.groupby("label")["amount"].sum()
+    label_totals = gas_df.groupby("label", observed=True)["amount"].sum()
     colors = ['#e74c3c', '#2ecc71']
     ax2.pie(label_totals.values, labels=label_totals.index, autopct='%1.1f%%',
             colors=colors, startangle=90)
@@ -230,7 +272,7 @@ def create_gas_station_analysis(df: pd.DataFrame, output_dir: Path):
     
     # Transaction amount distribution
     ax3 = axes[1, 0]
-    ax3.hist(gas_df["amount"], bins=20, color='steelblue', edgecolor='black', alpha=0.7)
+    plot_histogram(ax3, gas_df["amount"], 20, color='steelblue', edgecolor='black', alpha=0.7)
     ax3.axvline(x=30, color='red', linestyle='--', label='$30 threshold')
     ax3.set_xlabel("Transaction Amount ($)")
     ax3.set_ylabel("Frequency")
@@ -239,49 +281,44 @@ def create_gas_station_analysis(df: pd.DataFrame, output_dir: Path):
     
     # Transaction count
     ax4 = axes[1, 1]
-    label_counts = gas_df.groupby("label").size()
+    label_counts = gas_df.groupby("label", observed=True).size()
     bars = ax4.bar(label_counts.index, label_counts.values, color=colors)
     ax4.set_ylabel("Number of Transactions")
     ax4.set_title("Transaction Count")
-    for bar, val in zip(bars, label_counts.values):
-        ax4.text(bar.get_x() + bar.get_width()/2, val + 1, str(val), 
-                ha='center', va='bottom', fontsize=10)
+    ax4.bar_label(bars, fmt='%d', padding=3, fontsize=10)
     
-    plt.tight_layout()
     output_path = output_dir / "Gas_Station_Analysis.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
+@plt.style.context(CHART_STYLE)
 def create_walmart_analysis(df: pd.DataFrame, output_dir: Path):
     """Create Walmart spending analysis."""
-    walmart_df = df[df["label"] == "Walmart"]
+    walmart_df = df[label_mask(df, ["Walmart"])]
     
     if walmart_df.empty:
         print("No Walmart data to plot")
         return
     
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    fig = Figure(figsize=(14, 10), layout="constrained")
+    axes = fig.subplots(2, 2)
     fig.suptitle(f"Walmart Spending Analysis\nTotal: ${walmart_df['amount'].sum():.2f} ({len(walmart_df)} transactions)", 
                  fontsize=16, fontweight='bold')
     
     # Monthly Walmart spending
     ax1 = axes[0, 0]
-    monthly = walmart_df.groupby(walmart_df["date"].dt.to_period("M"))["amount"].sum()
+    monthly = walmart_df.groupby("month")["amount"].sum()
     bars = ax1.bar([str(m) for m in monthly.index], monthly.values, color='#0071ce', alpha=0.8)
     ax1.set_xlabel("Month")
     ax1.set_ylabel("Amount ($)")
     ax1.set_title("Monthly Walmart Spending")
-    plt.sca(ax1)
-    plt.xticks(rotation=45, ha='right')
-    for bar, val in zip(bars, monthly.values):
-        ax1.text(bar.get_x() + bar.get_width()/2, val + 2, f'${val:.0f}', 
-                ha='center', va='bottom', fontsize=8)
+    rotate_x_labels(ax1)
+    ax1.bar_label(bars, fmt='$%.0f', padding=3, fontsize=8)
     
     # Transaction size distribution
     ax2 = axes[0, 1]
-    ax2.hist(walmart_df["amount"], bins=15, color='#0071ce', edgecolor='black', alpha=0.7)
+    plot_histogram(ax2, walmart_df["amount"], 15, color='#0071ce', edgecolor='black', alpha=0.7)
     ax2.axvline(x=walmart_df["amount"].mean(), color='red', linestyle='--', 
                 label=f'Average: ${walmart_df["amount"].mean():.2f}')
     ax2.set_xlabel("Transaction Amount ($)")
@@ -291,165 +328,143 @@ def create_walmart_analysis(df: pd.DataFrame, output_dir: Path):
     
     # By card
     ax3 = axes[1, 0]
-    card_totals = walmart_df.groupby("card")["amount"].sum().sort_values(ascending=True)
+    card_totals = walmart_df.groupby("card", observed=True, sort=False)["amount"].sum().sort_values(ascending=True)
     bars = ax3.barh(card_totals.index, card_totals.values, color='#0071ce', alpha=0.8)
     ax3.set_xlabel("Amount ($)")
     ax3.set_title("Walmart Spending by Card")
-    for bar, val in zip(bars, card_totals.values):
-        ax3.text(val + 2, bar.get_y() + bar.get_height()/2, f'${val:.2f}', 
-                va='center', fontsize=9)
+    ax3.bar_label(bars, fmt='$%.2f', padding=3, fontsize=9)
     
     # Weekly pattern
     ax4 = axes[1, 1]
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    weekly = walmart_df.groupby("day_of_week")["amount"].sum().reindex(day_order)
-    ax4.bar(weekly.index, weekly.values, color='#0071ce', alpha=0.8)
+    weekly = np.bincount(walmart_df["dow"].to_numpy(), weights=walmart_df["amount"].to_numpy(), minlength=7)
+    ax4.bar(DAY_NAMES, weekly, color='#0071ce', alpha=0.8)
     ax4.set_xlabel("Day of Week")
     ax4.set_ylabel("Amount ($)")
     ax4.set_title("Walmart Spending by Day of Week")
-    plt.sca(ax4)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax4)
     
-    plt.tight_layout()
     output_path = output_dir / "Walmart_Analysis.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
+@plt.style.context(CHART_STYLE)
 def create_daily_pattern_chart(df: pd.DataFrame, output_dir: Path):
     """Create daily/weekly spending patterns."""
-    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    fig = Figure(figsize=(14, 6), layout="constrained")
+    axes = fig.subplots(1, 2)
     fig.suptitle("Spending Patterns", fontsize=16, fontweight='bold')
     
     # By day of week
     ax1 = axes[0]
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    daily = df.groupby("day_of_week")["amount"].sum().reindex(day_order)
+    dow = df["dow"].to_numpy()
+    daily = np.bincount(dow, weights=df["amount"].to_numpy(), minlength=7)
     colors = ['#3498db'] * 5 + ['#e74c3c'] * 2  # Weekdays blue, weekends red
-    bars = ax1.bar(daily.index, daily.values, color=colors, alpha=0.8)
+    bars = ax1.bar(DAY_NAMES, daily, color=colors, alpha=0.8)
     ax1.set_xlabel("Day of Week")
     ax1.set_ylabel("Total Spending ($)")
     ax1.set_title("Spending by Day of Week")
-    plt.sca(ax1)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax1)
     
-    for bar, val in zip(bars, daily.values):
-        ax1.text(bar.get_x() + bar.get_width()/2, val + 10, f'${val:.0f}', 
-                ha='center', va='bottom', fontsize=9)
+    ax1.bar_label(bars, fmt='$%.0f', padding=3, fontsize=9)
     
     # Average transaction by day
     ax2 = axes[1]
-    avg_daily = df.groupby("day_of_week")["amount"].mean().reindex(day_order)
-    bars = ax2.bar(avg_daily.index, avg_daily.values, color=colors, alpha=0.8)
+    day_counts = np.bincount(dow, minlength=7)
+    avg_daily = np.divide(daily, day_counts, out=np.full(7, np.nan), where=day_counts > 0)
+    bars = ax2.bar(DAY_NAMES, avg_daily, color=colors, alpha=0.8)
     ax2.set_xlabel("Day of Week")
     ax2.set_ylabel("Average Transaction ($)")
     ax2.set_title("Average Transaction by Day")
-    plt.sca(ax2)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax2)
     
-    for bar, val in zip(bars, avg_daily.values):
-        ax2.text(bar.get_x() + bar.get_width()/2, val + 0.5, f'${val:.2f}', 
-                ha='center', va='bottom', fontsize=9)
+    ax2.bar_label(bars, fmt='$%.2f', padding=3, fontsize=9)
     
-    plt.tight_layout()
     output_path = output_dir / "Daily_Patterns.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
-def create_top_merchants_chart(df: pd.DataFrame, output_dir: Path):
+@plt.style.context(CHART_STYLE)
+def create_top_merchants_chart(label_totals: pd.Series, label_counts: pd.Series, output_dir: Path):
     """Create top merchants/labels chart."""
-    label_totals = df.groupby("label")["amount"].sum().sort_values(ascending=False).head(15)
-    label_counts = df.groupby("label").size().loc[label_totals.index]
+    label_totals = label_totals.head(15)
+    label_counts = label_counts.loc[label_totals.index]
     
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 8))
+    fig = Figure(figsize=(16, 8), layout="constrained")
+    ax1, ax2 = fig.subplots(1, 2)
     fig.suptitle("Top 15 Spending Categories", fontsize=16, fontweight='bold')
     
     # By total amount
-    colors = plt.cm.viridis(np.linspace(0, 0.8, len(label_totals)))
+    colors = palette("viridis", len(label_totals), 0, 0.8)
     bars1 = ax1.barh(label_totals.index[::-1], label_totals.values[::-1], color=colors[::-1])
     ax1.set_xlabel("Total Amount ($)")
     ax1.set_title("By Total Spending")
     
-    for bar, val in zip(bars1, label_totals.values[::-1]):
-        ax1.text(val + 5, bar.get_y() + bar.get_height()/2, f'${val:.2f}', 
-                va='center', fontsize=9)
+    ax1.bar_label(bars1, fmt='$%.2f', padding=3, fontsize=9)
     
     # By transaction count
     bars2 = ax2.barh(label_counts.index[::-1], label_counts.values[::-1], color=colors[::-1])
     ax2.set_xlabel("Number of Transactions")
     ax2.set_title("By Transaction Count")
     
-    for bar, val in zip(bars2, label_counts.values[::-1]):
-        ax2.text(val + 0.5, bar.get_y() + bar.get_height()/2, str(val), 
-                va='center', fontsize=9)
+    ax2.bar_label(bars2, fmt='%d', padding=3, fontsize=9)
     
-    plt.tight_layout()
     output_path = output_dir / "Top_Categories.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
+@plt.style.context(CHART_STYLE)
 def create_vending_machine_analysis(df: pd.DataFrame, output_dir: Path):
     """Create vending machine spending analysis."""
-    vending_df = df[df["label"] == "Vending Machine"]
+    vending_df = df[label_mask(df, ["Vending Machine"])]
     
     if vending_df.empty:
         print("No vending machine data to plot")
         return
     
-    fig, axes = plt.subplots(1, 3, figsize=(16, 5))
+    fig = Figure(figsize=(16, 5), layout="constrained")
+    axes = fig.subplots(1, 3)
     fig.suptitle(f"Vending Machine Analysis\nTotal: ${vending_df['amount'].sum():.2f} ({len(vending_df)} transactions)", 
                  fontsize=16, fontweight='bold')
     
     # Monthly trend
     ax1 = axes[0]
-    monthly = vending_df.groupby(vending_df["date"].dt.to_period("M"))["amount"].sum()
+    monthly = vending_df.groupby("month")["amount"].sum()
     ax1.bar([str(m) for m in monthly.index], monthly.values, color='#9b59b6', alpha=0.8)
     ax1.set_xlabel("Month")
     ax1.set_ylabel("Amount ($)")
     ax1.set_title("Monthly Spending")
-    plt.sca(ax1)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax1)
     
     # Transaction distribution
     ax2 = axes[1]
-    ax2.hist(vending_df["amount"], bins=10, color='#9b59b6', edgecolor='black', alpha=0.7)
+    plot_histogram(ax2, vending_df["amount"], 10, color='#9b59b6', edgecolor='black', alpha=0.7)
     ax2.set_xlabel("Amount ($)")
     ax2.set_ylabel("Frequency")
     ax2.set_title("Transaction Amounts")
     
     # By day of week
     ax3 = axes[2]
-    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    daily = vending_df.groupby("day_of_week").size().reindex(day_order, fill_value=0)
-    ax3.bar(daily.index, daily.values, color='#9b59b6', alpha=0.8)
+    daily = np.bincount(vending_df["dow"].to_numpy(), minlength=7)
+    ax3.bar(DAY_NAMES, daily, color='#9b59b6', alpha=0.8)
     ax3.set_xlabel("Day of Week")
     ax3.set_ylabel("Transaction Count")
     ax3.set_title("Usage by Day")
-    plt.sca(ax3)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax3)
     
-    plt.tight_layout()
     output_path = output_dir / "Vending_Machine_Analysis.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
-def create_other_categories_breakdown(df: pd.DataFrame, output_dir: Path):
+@plt.style.context(CHART_STYLE)
+def create_other_categories_breakdown(label_totals: pd.Series, label_counts: pd.Series, output_dir: Path):
     """Create detailed breakdown of 'Other Categories' (everything beyond top 10)."""
-    category_totals = df.groupby("label")["amount"].sum().sort_values(ascending=False)
-    category_counts = df.groupby("label").size()
-    
     # Get categories beyond top 10
-    top_10_labels = category_totals.head(10).index.tolist()
-    other_df = df[~df["label"].isin(top_10_labels)]
-    other_totals = other_df.groupby("label")["amount"].sum().sort_values(ascending=False)
-    other_counts = other_df.groupby("label").size()
+    other_totals = label_totals.iloc[10:]
+    other_counts = label_counts.loc[other_totals.index]
     
     if other_totals.empty:
         print("No 'Other Categories' to plot")
@@ -457,7 +472,7 @@ def create_other_categories_breakdown(df: pd.DataFrame, output_dir: Path):
     
     total_other = other_totals.sum()
     
-    fig = plt.figure(figsize=(18, 14))
+    fig = Figure(figsize=(18, 14), layout="constrained")
     fig.suptitle(f"Detailed Breakdown: Other Categories\nTotal: ${total_other:,.2f} across {len(other_totals)} categories", 
                  fontsize=16, fontweight='bold')
     
@@ -468,25 +483,21 @@ def create_other_categories_breakdown(df: pd.DataFrame, output_dir: Path):
     
     # First half - horizontal bar chart
     ax1 = fig.add_subplot(2, 2, 1)
-    colors1 = plt.cm.viridis(np.linspace(0.2, 0.8, len(first_half)))
+    colors1 = palette("viridis", len(first_half), 0.2, 0.8)
     first_half_sorted = first_half.sort_values(ascending=True)
     bars1 = ax1.barh(first_half_sorted.index, first_half_sorted.values, color=colors1)
     ax1.set_xlabel("Amount ($)")
     ax1.set_title(f"Categories (Part 1 of 2)")
-    for bar, val in zip(bars1, first_half_sorted.values):
-        ax1.text(val + 1, bar.get_y() + bar.get_height()/2, f'${val:.2f}', 
-                va='center', fontsize=8)
+    ax1.bar_label(bars1, fmt='$%.2f', padding=3, fontsize=8)
     
     # Second half - horizontal bar chart
     ax2 = fig.add_subplot(2, 2, 2)
-    colors2 = plt.cm.plasma(np.linspace(0.2, 0.8, len(second_half)))
+    colors2 = palette("plasma", len(second_half), 0.2, 0.8)
     second_half_sorted = second_half.sort_values(ascending=True)
     bars2 = ax2.barh(second_half_sorted.index, second_half_sorted.values, color=colors2)
     ax2.set_xlabel("Amount ($)")
     ax2.set_title(f"Categories (Part 2 of 2)")
-    for bar, val in zip(bars2, second_half_sorted.values):
-        ax2.text(val + 1, bar.get_y() + bar.get_height()/2, f'${val:.2f}', 
-                va='center', fontsize=8)
+    ax2.bar_label(bars2, fmt='$%.2f', padding=3, fontsize=8)
     
     # Grouped by category type - pie chart
     ax3 = fig.add_subplot(2, 2, 3)
@@ -519,20 +530,17 @@ def create_other_categories_breakdown(df: pd.DataFrame, output_dir: Path):
         "Books": ["Books (Kindle)", "Books"],
     }
     
-    group_totals = {}
+    # Map each label to its group (first match wins, so labels listed twice
+    # aren't double counted); ungrouped categories fall into "Other"
+    label_to_group = {}
     for group_name, labels in category_groups.items():
-        group_sum = other_totals[other_totals.index.isin(labels)].sum()
-        if group_sum > 0:
-            group_totals[group_name] = group_sum
-    
-    # Add any ungrouped categories
-    grouped_labels = [label for labels in category_groups.values() for label in labels]
-    ungrouped = other_totals[~other_totals.index.isin(grouped_labels)].sum()
-    if ungrouped > 0:
-        group_totals["Other"] = ungrouped
-    
-    group_series = pd.Series(group_totals).sort_values(ascending=False)
-    colors3 = plt.cm.Set3(np.linspace(0, 1, len(group_series)))
+        for label in labels:
+            label_to_group.setdefault(label, group_name)
+    
+    groups = other_totals.index.astype(object).map(label_to_group).fillna("Other")
+    group_series = other_totals.groupby(groups.to_numpy(), sort=False).sum().sort_values(ascending=False)
+    group_series = group_series[group_series > 0]
+    colors3 = palette("Set3", len(group_series))
     wedges, texts, autotexts = ax3.pie(
         group_series.values,
         labels=None,
@@ -555,30 +563,28 @@ def create_other_categories_breakdown(df: pd.DataFrame, output_dir: Path):
         'amount': other_totals,
         'count': other_counts[other_totals.index]
     })
-    scatter = ax4.scatter(other_data['count'], other_data['amount'], 
-                         c=range(len(other_data)), cmap='viridis', 
-                         s=100, alpha=0.7, edgecolors='black')
+    ax4.scatter(other_data['count'], other_data['amount'], 
+                c=range(len(other_data)), cmap='viridis', 
+                s=100, alpha=0.7, edgecolors='black')
     ax4.set_xlabel("Number of Transactions")
     ax4.set_ylabel("Total Amount ($)")
     ax4.set_title("Transaction Count vs Total Spending")
     
     # Label top spenders
     top_5_other = other_totals.head(5)
-    for label in top_5_other.index:
-        x = other_data.loc[label, 'count']
-        y = other_data.loc[label, 'amount']
+    top_points = other_data.loc[top_5_other.index, ['count', 'amount']].to_numpy()
+    for label, (x, y) in zip(top_5_other.index, top_points):
         ax4.annotate(label, (x, y), textcoords="offset points", xytext=(5, 5), fontsize=7)
     
-    plt.tight_layout(rect=[0, 0, 1, 0.95])
     output_path = output_dir / "Other_Categories_Breakdown.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
-def create_summary_dashboard(df: pd.DataFrame, output_dir: Path):
+@plt.style.context(CHART_STYLE)
+def create_summary_dashboard(df: pd.DataFrame, label_totals: pd.Series, monthly: pd.Series, output_dir: Path):
     """Create a summary dashboard with key metrics."""
-    fig = plt.figure(figsize=(16, 12))
+    fig = Figure(figsize=(16, 12), layout="constrained")
     fig.suptitle("2025 Expense Summary Dashboard", fontsize=20, fontweight='bold', y=0.98)
     
     # Key metrics text
@@ -594,52 +600,51 @@ def create_summary_dashboard(df: pd.DataFrame, output_dir: Path):
     Average Transaction: ${avg_transaction:.2f}
     Period: {date_range}
     """
-    fig.text(0.5, 0.92, metrics_text, ha='center', fontsize=12, 
+    fig.text(0.5, 0.95, metrics_text, ha='center', va='top', fontsize=12, 
              bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.5))
     
+    # One grid for every panel so constrained layout can space the rows
+    grid = fig.add_gridspec(2, 3)
+    
     # Top 5 categories pie
-    ax1 = fig.add_subplot(2, 3, 1)
-    top_5 = df.groupby("label")["amount"].sum().sort_values(ascending=False).head(5)
+    ax1 = fig.add_subplot(grid[0, 0])
+    top_5 = label_totals.head(5)
     colors = plt.cm.Set2(range(len(top_5)))
     ax1.pie(top_5.values, labels=top_5.index, autopct='%1.1f%%', colors=colors)
     ax1.set_title("Top 5 Categories")
     
     # Monthly trend
-    ax2 = fig.add_subplot(2, 3, 2)
-    monthly = df.groupby(df["date"].dt.to_period("M"))["amount"].sum()
+    ax2 = fig.add_subplot(grid[0, 1])
     ax2.plot([str(m) for m in monthly.index], monthly.values, 'b-o', linewidth=2, markersize=8)
     ax2.fill_between(range(len(monthly)), monthly.values, alpha=0.3)
     ax2.set_title("Monthly Trend")
     ax2.set_ylabel("Amount ($)")
-    plt.sca(ax2)
-    plt.xticks(rotation=45, ha='right')
+    rotate_x_labels(ax2)
     
     # Card distribution
-    ax3 = fig.add_subplot(2, 3, 3)
-    card_totals = df.groupby("card")["amount"].sum()
+    ax3 = fig.add_subplot(grid[0, 2])
+    card_totals = df.groupby("card", observed=True)["amount"].sum()
     ax3.pie(card_totals.values, labels=card_totals.index, autopct='%1.1f%%')
     ax3.set_title("Spending by Card")
     
     # Top 10 categories bar
-    ax4 = fig.add_subplot(2, 1, 2)
-    top_10 = df.groupby("label")["amount"].sum().sort_values(ascending=True).tail(10)
-    colors = plt.cm.viridis(np.linspace(0.2, 0.8, len(top_10)))
+    ax4 = fig.add_subplot(grid[1, :])
+    top_10 = label_totals.head(10).sort_values(ascending=True)
+    colors = palette("viridis", len(top_10), 0.2, 0.8)
     bars = ax4.barh(top_10.index, top_10.values, color=colors)
     ax4.set_xlabel("Amount ($)")
     ax4.set_title("Top 10 Spending Categories")
-    for bar, val in zip(bars, top_10.values):
-        ax4.text(val + 10, bar.get_y() + bar.get_height()/2, f'${val:.0f}', 
-                va='center', fontsize=9)
+    ax4.bar_label(bars, fmt='$%.0f', padding=3, fontsize=9)
     
-    plt.tight_layout(rect=[0, 0, 1, 0.88])
+    # Keep the subplots clear of the metrics box
+    fig.get_layout_engine().set(rect=(0, 0, 1, 0.83))
     output_path = output_dir / "Summary_Dashboard.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    fig.savefig(output_path, dpi=DASHBOARD_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
     print(f"Saved: {output_path}")
 
 
-def main():
-    """Main function to generate all overall diagrams."""
+def main(max_workers: int | None = None):
+    """Main function to generate all overall diagrams, rendering in up to max_workers processes."""
     base_dir = Path(__file__).parent.parent
     csv_dir = base_dir / "csv"
     output_dir = base_dir / "overall_diagrams"
@@ -661,20 +666,32 @@ def main():
     print(f"Date range: {df['date'].min().strftime('%Y-%m-%d')} to {df['date'].max().strftime('%Y-%m-%d')}")
     print(f"Total spending: ${df['amount'].sum():,.2f}\n")
     
-    # Generate all diagrams
+    # Aggregates shared by several charts, computed once
+    label_stats = df.groupby("label", observed=True, sort=False)["amount"].agg(["sum", "size"])
+    label_totals = label_stats["sum"].sort_values(ascending=False)
+    label_counts = label_stats["size"]
+    monthly = df.groupby("month")["amount"].sum()
+    
+    # Generate all diagrams; each chart is independent and CPU-bound, and
+    # pyplot is not thread-safe, so render them in separate processes
     print("Generating diagrams...")
-    create_summary_dashboard(df, output_dir)
-    create_monthly_spending_chart(df, output_dir)
-    create_category_breakdown(df, output_dir)
-    create_other_categories_breakdown(df, output_dir)
-    create_card_spending_chart(df, output_dir)
-    create_top_merchants_chart(df, output_dir)
-    create_daily_pattern_chart(df, output_dir)
-    create_restaurant_breakdown(df, output_dir)
-    create_gas_station_analysis(df, output_dir)
-    create_walmart_analysis(df, output_dir)
-    create_vending_machine_analysis(df, output_dir)
-    create_other_categories_breakdown(df, output_dir)
+    charts = [
+        (create_summary_dashboard, df, label_totals, monthly),
+        (create_monthly_spending_chart, monthly),
+        (create_category_breakdown, label_totals),
+        (create_other_categories_breakdown, label_totals, label_counts),
+        (create_card_spending_chart, df),
+        (create_top_merchants_chart, label_totals, label_counts),
+        (create_daily_pattern_chart, df),
+        (create_restaurant_breakdown, df),
+        (create_gas_station_analysis, df),
+        (create_walmart_analysis, df),
+        (create_vending_machine_analysis, df),
+    ]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, *args, output_dir) for func, *args in charts]
+        for future in futures:
+            future.result()
     
     print(f"\n{'=' * 60}")
     print(f"All diagrams saved to: {output_dir}")
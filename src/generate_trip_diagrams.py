@@ -4,11 +4,17 @@ Creates visualizations for each trip with breakdown by category.
 """
 
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # Render straight to files, no GUI backend
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import matplotlib.dates as mdates
-import seaborn as sns
+import numpy as np
+import html
+import io
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 
 # Define trips with date ranges
@@ -50,50 +56,116 @@ TRIPS = {
     }
 }
 
-# Set style
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette("husl")
+# Chart style, applied only while a chart is drawn so importing this
+# module leaves the global rcParams untouched
+CHART_STYLE = 'seaborn-v0_8-whitegrid'
+
+# Typed Parquet copy of the merged CSV, reused while it is newer than both the
+# CSV and this script (so changes to load_transactions invalidate it)
+PARQUET_CACHE_SUFFIX = ".trip.parquet"
+
+# Strips spaces and parentheses from trip names for use in file names
+SAFE_NAME_TABLE = str.maketrans({" ": "_", "(": "", ")": ""})
+
+# Output resolution for the trip charts
+CHART_DPI = 100
+
+# Fast zlib level for the PNGs; chart images barely shrink at higher levels
+PNG_OPTIONS = {"compress_level": 1, "optimize": False}
+
+# Header and alternating row colors for the transaction details pages
+DETAILS_STYLE = """<style>
+table { border-collapse: collapse; font-family: sans-serif; font-size: 14px; }
+th { background: #4472C4; color: white; text-align: left; padding: 6px 10px; }
+td { padding: 6px 10px; }
+tbody tr:nth-child(even) { background: #E7E6E6; }
+</style>"""
+
+
+def save_png(fig: Figure, output_path: Path):
+    """Render a figure to PNG in memory, then move it into place in one step."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=CHART_DPI, facecolor='white', pil_kwargs=PNG_OPTIONS)
+    
+    # A crash mid-save leaves the previous chart intact instead of a truncated file
+    tmp_path = output_path.with_name(f".{output_path.name}.tmp")
+    tmp_path.write_bytes(buf.getvalue())
+    tmp_path.replace(output_path)
 
 
 def load_transactions(csv_path: str) -> pd.DataFrame:
-    """Load merged transactions CSV."""
-    df = pd.read_csv(csv_path)
-    df["date"] = pd.to_datetime(df["date"])
+    """Load merged transactions CSV sorted by date, reusing the Parquet cache when it is current."""
+    cache_path = Path(csv_path).with_suffix(PARQUET_CACHE_SUFFIX)
+    inputs_mtime = max(Path(csv_path).stat().st_mtime, Path(__file__).stat().st_mtime)
+    if cache_path.exists() and cache_path.stat().st_mtime >= inputs_mtime:
+        return pd.read_parquet(cache_path)
+    
+    # Multithreaded Arrow parse that also converts the dates in the same pass
+    df = pd.read_csv(
+        csv_path,
+        engine="pyarrow",
+        dtype={"amount": "float64", "label": "category", "card": "category"},
+        parse_dates=["date"],
+    )
+    df["day"] = df["date"].values.astype("datetime64[D]")  # Calendar day, kept as datetime64
+    df = df.sort_values("date", kind="stable", ignore_index=True)
+    
+    df.to_parquet(cache_path, compression="zstd", index=False)
     return df
 
 
-def filter_trip_transactions(df: pd.DataFrame, start_date: str, end_date: str) -> pd.DataFrame:
-    """Filter transactions for a specific date range.
+def assign_trips(df: pd.DataFrame) -> pd.DataFrame:
+    """Tag every transaction with the trip whose date range contains it (NaN if none).
     
-    Also excludes Walmart transactions over $30 as they are likely 
-    pre-ordered items that settled during the trip.
+    A transaction inside overlapping trips appears once per trip.
     """
-    start = pd.to_datetime(start_date)
-    end = pd.to_datetime(end_date) + timedelta(days=1)  # Include end date
-    
-    mask = (df["date"] >= start) & (df["date"] < end)
-    trip_df = df[mask].copy()
+    starts = pd.to_datetime([trip_info["start"] for trip_info in TRIPS.values()])
+    ends = pd.to_datetime([trip_info["end"] for trip_info in TRIPS.values()]) + timedelta(days=1)  # Include end date
+    
+    # One bucketing pass over the dates instead of a mask per trip; pd.cut
+    # only accepts trips that don't overlap
+    intervals = pd.IntervalIndex.from_arrays(starts, ends, closed="left")
+    if not intervals.is_overlapping:
+        df["trip"] = pd.cut(df["date"], intervals).cat.rename_categories(list(TRIPS))
+        return df
+    
+    # Overlapping or nested trips: a copy of the rows for each trip's date range
+    masks = [(df["date"] >= start) & (df["date"] < end) for start, end in zip(starts, ends)]
+    parts = [df[mask].assign(trip=trip_name) for trip_name, mask in zip(TRIPS, masks)]
+    parts.append(df[~np.logical_or.reduce(masks)].assign(trip=None))
+    df = pd.concat(parts, ignore_index=True)
+    df["trip"] = pd.Categorical(df["trip"], categories=list(TRIPS))
+    return df
+
+
+def filter_trip_transactions(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Keep only transactions that fall within a trip.
     
-    # Exclude Walmart transactions over $30 (likely pre-ordered items)
-    walmart_over_30_mask = (trip_df["label"] == "Walmart") & (trip_df["amount"] > 30)
-    excluded_count = walmart_over_30_mask.sum()
-    if excluded_count > 0:
-        excluded_total = trip_df.loc[walmart_over_30_mask, "amount"].sum()
-        print(f"  Excluding {excluded_count} Walmart transactions over $30 (${excluded_total:.2f} total)")
+    Also excludes Walmart transactions over $30 as they are likely 
+    pre-ordered items that settled during the trip. Returns the trip
+    transactions and the per-trip count and total of the excluded ones.
+    """
+    trip_df = df[df["trip"].notna()]
     
-    trip_df = trip_df[~walmart_over_30_mask]
+    # Exclude Walmart transactions over $30 (likely pre-ordered items);
+    # eval fuses both comparisons when numexpr is installed
+    walmart_over_30_mask = trip_df.eval("label == 'Walmart' and amount > 30")
+    excluded = trip_df[walmart_over_30_mask].groupby("trip", observed=True)["amount"].agg(["size", "sum"])
     
-    return trip_df
+    return trip_df[~walmart_over_30_mask], excluded
 
 
-def create_trip_summary_figure(trip_df: pd.DataFrame, trip_name: str, trip_desc: str, output_dir: Path):
-    """Create a comprehensive trip summary figure with multiple charts."""
+@plt.style.context(CHART_STYLE)
+def create_trip_summary_figure(trip_df: pd.DataFrame, label_totals: pd.Series, card_totals: pd.Series,
+                               daily_totals: pd.Series, trip_name: str, safe_name: str, trip_desc: str,
+                               output_dir: Path):
+    """Create a comprehensive trip summary figure from the trip's precomputed totals."""
     if trip_df.empty:
         print(f"  No transactions found for {trip_name}")
         return None
     
-    # Create figure with subplots
-    fig = plt.figure(figsize=(16, 12))
+    # Created inside the chart style so figure-level settings follow it too
+    fig = Figure(figsize=(16, 12))
     fig.suptitle(f"Expense Report: {trip_desc}", fontsize=16, fontweight='bold', y=0.98)
     
     # Calculate totals
@@ -106,17 +178,23 @@ def create_trip_summary_figure(trip_df: pd.DataFrame, trip_name: str, trip_desc:
     
     # 1. Pie Chart - Expenses by Category/Label
     ax1 = fig.add_subplot(2, 2, 1)
-    label_totals = trip_df.groupby("label")["amount"].sum().sort_values(ascending=False)
+    label_totals = label_totals.sort_values(ascending=False)
     
     # Create pie chart
     colors = plt.cm.Set3(range(len(label_totals)))
     wedges, texts, autotexts = ax1.pie(
         label_totals.values,
         labels=None,
-        autopct=lambda pct: f'${pct/100*total_spent:.2f}\n({pct:.1f}%)' if pct > 5 else '',
+        autopct=lambda pct: '',
         colors=colors,
         startangle=90
     )
+    
+    # Fill in the wedge labels from the amounts directly
+    shares = 100 * label_totals.values / label_totals.values.sum()
+    for autotext, amount, share in zip(autotexts, label_totals.values, shares):
+        if share > 5:
+            autotext.set_text(f'${amount:.2f}\n({share:.1f}%)')
     ax1.set_title("Expenses by Category", fontsize=12, fontweight='bold')
     
     # Add legend
@@ -130,9 +208,11 @@ def create_trip_summary_figure(trip_df: pd.DataFrame, trip_name: str, trip_desc:
     
     # 2. Bar Chart - Expenses by Card
     ax2 = fig.add_subplot(2, 2, 2)
-    card_totals = trip_df.groupby("card")["amount"].sum().sort_values(ascending=True)
+    card_totals = card_totals.sort_values(ascending=True)
     
-    bars = ax2.barh(card_totals.index, card_totals.values, color=sns.color_palette("viridis", len(card_totals)))
+    # Evenly spaced viridis colors, skipping the colormap's two extremes
+    card_colors = plt.cm.viridis(np.linspace(0, 1, len(card_totals) + 2)[1:-1])
+    bars = ax2.barh(card_totals.index, card_totals.values, color=card_colors)
     ax2.set_xlabel("Amount ($)")
     ax2.set_title("Expenses by Card", fontsize=12, fontweight='bold')
     
@@ -142,7 +222,6 @@ def create_trip_summary_figure(trip_df: pd.DataFrame, trip_name: str, trip_desc:
     
     # 3. Daily Expenses Timeline
     ax3 = fig.add_subplot(2, 1, 2)
-    daily_totals = trip_df.groupby(trip_df["date"].dt.date)["amount"].sum()
     
     if len(daily_totals) > 1:
         ax3.bar(daily_totals.index, daily_totals.values, color='steelblue', alpha=0.7, edgecolor='navy')
@@ -156,107 +235,76 @@ def create_trip_summary_figure(trip_df: pd.DataFrame, trip_name: str, trip_desc:
     
     # Format x-axis dates
     ax3.xaxis.set_major_formatter(mdates.DateFormatter('%b %d'))
-    plt.xticks(rotation=45)
+    for tick_label in ax3.get_xticklabels():
+        tick_label.set_rotation(45)
     
     # Add value labels on bars
     for date, val in daily_totals.items():
         ax3.text(date, val + 1, f'${val:.2f}', ha='center', fontsize=9)
     
-    plt.tight_layout(rect=[0, 0, 1, 0.92])
+    fig.tight_layout(rect=[0, 0, 1, 0.92])
     
     # Save figure
-    safe_name = trip_name.replace(" ", "_").replace("(", "").replace(")", "")
     output_path = output_dir / f"{safe_name}_expenses.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    save_png(fig, output_path)
     
     print(f"  Saved: {output_path}")
     return output_path
 
 
-def create_transaction_details_table(trip_df: pd.DataFrame, trip_name: str, output_dir: Path):
-    """Create a detailed transaction table image."""
+def create_transaction_details_table(trip_df: pd.DataFrame, trip_name: str, safe_name: str, output_dir: Path):
+    """Write the trip's transactions as a styled HTML table."""
     if trip_df.empty:
         return None
     
     # Sort by date and amount
     trip_df = trip_df.sort_values(["date", "amount"], ascending=[True, False])
     
-    # Create figure
-    fig, ax = plt.subplots(figsize=(14, max(4, len(trip_df) * 0.4)))
-    ax.axis('off')
-    
-    # Prepare table data
-    table_data = []
-    for _, row in trip_df.iterrows():
-        table_data.append([
-            row["date"].strftime("%Y-%m-%d"),
-            row["description"][:40] + "..." if len(str(row["description"])) > 40 else row["description"],
-            f"${row['amount']:.2f}",
-            row["label"],
-            row["card"]
-        ])
-    
-    # Create table
-    table = ax.table(
-        cellText=table_data,
-        colLabels=["Date", "Description", "Amount", "Category", "Card"],
-        cellLoc='left',
-        loc='center',
-        colWidths=[0.12, 0.4, 0.12, 0.18, 0.18]
+    details = pd.DataFrame({
+        "Date": trip_df["date"].dt.strftime("%Y-%m-%d"),
+        "Description": trip_df["description"],
+        "Amount": "$" + trip_df["amount"].map("{:.2f}".format),
+        "Category": trip_df["label"],
+        "Card": trip_df["card"],
+    })
+    
+    title = html.escape(f"Transaction Details: {trip_name}")
+    
+    output_path = output_dir / f"{safe_name}_details.html"
+    output_path.write_text(
+        f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{title}</title>\n"
+        f"{DETAILS_STYLE}\n</head>\n<body>\n<h2>{title}</h2>\n"
+        f"{details.to_html(index=False, border=0)}\n</body>\n</html>\n",
+        encoding="utf-8",
     )
     
-    # Style table
-    table.auto_set_font_size(False)
-    table.set_fontsize(9)
-    table.scale(1, 1.5)
-    
-    # Style header
-    for i in range(5):
-        table[(0, i)].set_facecolor('#4472C4')
-        table[(0, i)].set_text_props(color='white', fontweight='bold')
-    
-    # Alternate row colors
-    for i in range(1, len(table_data) + 1):
-        color = '#E7E6E6' if i % 2 == 0 else 'white'
-        for j in range(5):
-            table[(i, j)].set_facecolor(color)
-    
-    safe_name = trip_name.replace(" ", "_").replace("(", "").replace(")", "")
-    
-    plt.title(f"Transaction Details: {trip_name}", fontsize=14, fontweight='bold', pad=20)
-    
-    output_path = output_dir / f"{safe_name}_details.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
-    
     print(f"  Saved: {output_path}")
     return output_path
 
 
-def create_all_trips_comparison(df: pd.DataFrame, output_dir: Path):
+def render_trip(trip_df: pd.DataFrame, label_totals: pd.Series, card_totals: pd.Series,
+                daily_totals: pd.Series, trip_name: str, safe_name: str, trip_desc: str, output_dir: Path):
+    """Create the summary figure and transaction details table for one trip."""
+    create_trip_summary_figure(trip_df, label_totals, card_totals, daily_totals, trip_name, safe_name, trip_desc,
+                               output_dir)
+    create_transaction_details_table(trip_df, trip_name, safe_name, output_dir)
+
+
+@plt.style.context(CHART_STYLE)
+def create_all_trips_comparison(trip_df: pd.DataFrame, output_dir: Path):
     """Create a comparison chart of all trips."""
-    trip_totals = []
-    
-    for trip_name, trip_info in TRIPS.items():
-        trip_df = filter_trip_transactions(df, trip_info["start"], trip_info["end"])
-        if not trip_df.empty:
-            trip_totals.append({
-                "trip": trip_name,
-                "total": trip_df["amount"].sum(),
-                "transactions": len(trip_df),
-                "start": trip_info["start"]
-            })
-    
-    if not trip_totals:
+    if trip_df.empty:
         print("No trip data to compare")
         return None
     
-    trip_summary = pd.DataFrame(trip_totals)
+    trip_summary = trip_df.groupby("trip", observed=True)["amount"].agg(total="sum", transactions="size").reset_index()
+    trip_summary["trip"] = trip_summary["trip"].astype(str)
+    trip_summary["start"] = trip_summary["trip"].map(lambda trip_name: TRIPS[trip_name]["start"])
     trip_summary = trip_summary.sort_values("start")
     
     # Create figure
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    fig = Figure(figsize=(14, 6))
+    ax1, ax2 = fig.subplots(1, 2)
     fig.suptitle("Trip Expenses Comparison - 2025", fontsize=16, fontweight='bold')
     
     # Bar chart of total expenses
@@ -264,8 +312,9 @@ def create_all_trips_comparison(df: pd.DataFrame, output_dir: Path):
     bars = ax1.bar(trip_summary["trip"], trip_summary["total"], color=colors)
     ax1.set_ylabel("Total Expenses ($)")
     ax1.set_title("Total Expenses by Trip")
-    plt.sca(ax1)
-    plt.xticks(rotation=45, ha='right')
+    for tick_label in ax1.get_xticklabels():
+        tick_label.set_rotation(45)
+        tick_label.set_ha('right')
     
     # Add value labels
     for bar, val in zip(bars, trip_summary["total"]):
@@ -273,22 +322,24 @@ def create_all_trips_comparison(df: pd.DataFrame, output_dir: Path):
                 ha='center', va='bottom', fontsize=9)
     
     # Pie chart of expenses distribution
-    ax2.pie(trip_summary["total"], labels=trip_summary["trip"], autopct='%1.1f%%',
-            colors=colors, startangle=90)
+    _, _, autotexts = ax2.pie(trip_summary["total"], labels=trip_summary["trip"], autopct=lambda pct: '',
+                              colors=colors, startangle=90)
+    shares = 100 * trip_summary["total"].values / trip_summary["total"].values.sum()
+    for autotext, share in zip(autotexts, shares):
+        autotext.set_text(f'{share:.1f}%')
     ax2.set_title("Expense Distribution")
     
-    plt.tight_layout()
+    fig.tight_layout()
     
     output_path = output_dir / "All_Trips_Comparison.png"
-    plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-    plt.close()
+    save_png(fig, output_path)
     
     print(f"Saved: {output_path}")
     return output_path
 
 
-def main():
-    """Main function to generate all trip diagrams."""
+def main(max_workers: int | None = None):
+    """Main function to generate all trip diagrams, rendering in up to max_workers processes."""
     base_dir = Path(__file__).parent.parent
     csv_dir = base_dir / "csv"
     output_dir = base_dir / "trip_diagrams"
@@ -308,24 +359,44 @@ def main():
     df = load_transactions(str(merged_csv))
     print(f"Loaded {len(df)} total transactions\n")
     
-    # Generate diagrams for each trip
-    for trip_name, trip_info in TRIPS.items():
-        print(f"\nProcessing: {trip_name}")
-        print(f"  Date Range: {trip_info['start']} to {trip_info['end']}")
+    df = assign_trips(df)
+    all_trips_df, excluded = filter_trip_transactions(df)
+    trip_groups = dict(iter(all_trips_df.groupby("trip", observed=True)))
+    
+    # Totals for every trip's summary figure, grouped once across all trips
+    label_totals = all_trips_df.groupby(["trip", "label"], observed=True)["amount"].sum()
+    card_totals = all_trips_df.groupby(["trip", "card"], observed=True)["amount"].sum()
+    daily_totals = all_trips_df.groupby(["trip", "day"], observed=True)["amount"].sum()
+    
+    # Generate diagrams for each trip; trips are independent and the charts
+    # are CPU-bound, so render them in separate processes
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for trip_name, trip_info in TRIPS.items():
+            print(f"\nProcessing: {trip_name}")
+            print(f"  Date Range: {trip_info['start']} to {trip_info['end']}")
+            
+            if trip_name in excluded.index:
+                excluded_count = excluded.at[trip_name, "size"]
+                excluded_total = excluded.at[trip_name, "sum"]
+                print(f"  Excluding {excluded_count} Walmart transactions over $30 (${excluded_total:.2f} total)")
+            
+            trip_df = trip_groups.get(trip_name, all_trips_df.iloc[:0])
+            print(f"  Found {len(trip_df)} transactions, Total: ${trip_df['amount'].sum():.2f}")
+            
+            if not trip_df.empty:
+                futures.append(executor.submit(
+                    render_trip, trip_df, label_totals.loc[trip_name], card_totals.loc[trip_name],
+                    daily_totals.loc[trip_name], trip_name, trip_name.translate(SAFE_NAME_TABLE),
+                    trip_info["description"], output_dir
+                ))
         
-        trip_df = filter_trip_transactions(df, trip_info["start"], trip_info["end"])
-        print(f"  Found {len(trip_df)} transactions, Total: ${trip_df['amount'].sum():.2f}")
+        # Create comparison chart
+        print(f"\nGenerating comparison chart...")
+        futures.append(executor.submit(create_all_trips_comparison, all_trips_df, output_dir))
         
-        if not trip_df.empty:
-            # Create summary figure
-            create_trip_summary_figure(trip_df, trip_name, trip_info["description"], output_dir)
-            
-            # Create transaction details table
-            create_transaction_details_table(trip_df, trip_name, output_dir)
-    
-    # Create comparison chart
-    print(f"\nGenerating comparison chart...")
-    create_all_trips_comparison(df, output_dir)
+        for future in futures:
+            future.result()
     
     print(f"\n{'=' * 60}")
     print(f"All diagrams saved to: {output_dir}")
@@ -3,487 +3,479 @@ Merge all CSV files (CapitalOne, Discover, Chase) into one unified CSV.
 Apply labeling rules for vending machine expenses, SimpleBills, and Shell gas station.
 """
 
+import hashlib
+import io
+import re
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from datetime import datetime
 
 
-def normalize_date(date_str: str) -> str:
-    """Convert various date formats to YYYY-MM-DD."""
-    date_str = str(date_str).strip()
+# Bank exports are UTF-8, or else Latin-1, which maps every byte and so
+# always decodes
+CSV_ENCODING = "utf-8"
+CSV_FALLBACK_ENCODING = "latin-1"
+
+# Sidecar next to the merged CSV holding the hash of the inputs it was built
+# from; the merge is skipped while it still matches
+CACHE_KEY_SUFFIX = ".cache_key"
+
+
+def normalize_dates(dates: pd.Series) -> pd.Series:
+    """Parse a column of dates in any of the supported formats to datetime64."""
+    # The Arrow CSV reader already converts ISO dates itself
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
     
-    # Try different formats
+    dates = dates.astype(str).str.strip()
+    
+    # Try different formats, each one vectorized over the whole column
     formats = [
         "%Y-%m-%d",      # 2025-01-15
         "%m/%d/%Y",      # 01/15/2025
         "%m/%d/%y",      # 01/15/25
     ]
     
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(date_str, fmt)
-            return dt.strftime("%Y-%m-%d")
-        except ValueError:
-            continue
+    parsed = pd.to_datetime(dates, format=formats[0], errors="coerce")
+    for fmt in formats[1:]:
+        parsed = parsed.fillna(pd.to_datetime(dates, format=fmt, errors="coerce"))
     
-    return date_str
+    return parsed
+
+
+def read_bank_csv(file_path: str) -> pd.DataFrame:
+    """Read a bank CSV with the Arrow parser, falling back to Latin-1 if it isn't UTF-8."""
+    # The file is read from disk once; the UTF-8 check and the parse share the bytes
+    raw = Path(file_path).read_bytes()
+    try:
+        raw.decode(CSV_ENCODING)
+        encoding = CSV_ENCODING
+    except UnicodeDecodeError:
+        encoding = CSV_FALLBACK_ENCODING
+    
+    return pd.read_csv(io.BytesIO(raw), encoding=encoding, engine="pyarrow")
+
+
+def upper_descriptions(descriptions: pd.Series) -> pd.Series:
+    """Upper-case descriptions as Arrow-backed strings for the labeling rules."""
+    # Arrow-backed strings, so every str.contains on them runs as a vectorized
+    # pyarrow regex kernel instead of a Python loop over the rows
+    return descriptions.astype("string[pyarrow]").str.upper()
 
 
 def load_capital_one(file_path: str) -> pd.DataFrame:
     """Load and normalize CapitalOne CSV."""
-    # Try different encodings to handle special characters
-    encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-    df = None
-    for encoding in encodings:
-        try:
-            df = pd.read_csv(file_path, encoding=encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-    
-    if df is None:
-        raise ValueError(f"Could not read {file_path} with any encoding")
+    df = read_bank_csv(file_path)
     
     # Filter out credits/payments (only keep debits)
-    df = df[df["Debit"].notna()].copy()
+    columns = {"Transaction Date": "date", "Description": "description", "Debit": "amount", "Category": "category"}
+    df = df.loc[df["Debit"].notna(), list(columns)].rename(columns=columns)
     
     # Normalize columns
-    normalized = pd.DataFrame({
-        "date": df["Transaction Date"].apply(normalize_date),
-        "description": df["Description"],
-        "amount": df["Debit"],
-        "category": df["Category"],
-        "card": "CapitalOne",
-        "source": Path(file_path).name
-    })
+    df["date"] = normalize_dates(df["date"])
+    df["card"] = "CapitalOne"
+    df["source"] = Path(file_path).name
+    df["desc_up"] = upper_descriptions(df["description"])
     
-    return normalized
+    return df
 
 
 def load_discover(file_path: str) -> pd.DataFrame:
     """Load and normalize Discover CSV."""
-    # Try different encodings to handle special characters
-    encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-    df = None
-    for encoding in encodings:
-        try:
-            df = pd.read_csv(file_path, encoding=encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-    
-    if df is None:
-        raise ValueError(f"Could not read {file_path} with any encoding")
+    df = read_bank_csv(file_path)
     
     # Filter out payments and credits (negative amounts or specific categories)
-    df = df[df["Amount"] > 0].copy()
-    df = df[~df["Category"].isin(["Payments and Credits", "Awards and Rebate Credits"])].copy()
+    keep = (df["Amount"] > 0) & ~df["Category"].isin(["Payments and Credits", "Awards and Rebate Credits"])
+    columns = {"Trans. Date": "date", "Description": "description", "Amount": "amount", "Category": "category"}
+    df = df.loc[keep, list(columns)].rename(columns=columns)
     
     # Normalize columns
-    normalized = pd.DataFrame({
-        "date": df["Trans. Date"].apply(normalize_date),
-        "description": df["Description"],
-        "amount": df["Amount"],
-        "category": df["Category"],
-        "card": "Discover",
-        "source": Path(file_path).name
-    })
+    df["date"] = normalize_dates(df["date"])
+    df["card"] = "Discover"
+    df["source"] = Path(file_path).name
+    df["desc_up"] = upper_descriptions(df["description"])
     
-    return normalized
+    return df
 
 
 def load_chase(file_path: str) -> pd.DataFrame:
     """Load and normalize Chase CSV (extracted from PDFs)."""
-    # Try different encodings to handle special characters
-    encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-    df = None
-    for encoding in encodings:
-        try:
-            df = pd.read_csv(file_path, encoding=encoding)
-            break
-        except UnicodeDecodeError:
-            continue
-    
-    if df is None:
-        raise ValueError(f"Could not read {file_path} with any encoding")
+    df = read_bank_csv(file_path)
     
     # Already normalized during extraction
-    normalized = pd.DataFrame({
-        "date": df["date"],
-        "description": df["description"],
-        "amount": df["amount"],
-        "category": df["category"],
-        "card": df["card"],
-        "source": df["source"]
-    })
+    df = df[["date", "description", "amount", "category", "card", "source"]]
+    df["date"] = normalize_dates(df["date"])
+    df["desc_up"] = upper_descriptions(df["description"])
     
-    return normalized
+    return df
 
 
-def apply_labels(df: pd.DataFrame) -> pd.DataFrame:
-    """Apply custom labels based on merchant patterns."""
-    df = df.copy()
-    
-    # Create a new 'label' column
-    df["label"] = df["category"]  # Default to original category
-    
+# Vending machine merchants (applied first, before restaurants)
+VENDING_PATTERNS = [
+    "AMK MSU POD UNION",
+    "AMK MSU POD",
+    "AMK POD",
+    "AMK MSU EINSTEINS",
+    "AMK MSU GRIFFIS",
+    "AMK MSU PANDA",  # Campus vending, not Panda Express restaurant
+    "CTLP*REFRESHMENTS INC",
+    "CTLP*REFRESH",
+    "COCA COLA CLARK STARKVIL",
+    "COCA COLA CLARK STARKV",
+    "COCA COLA SOUTH METRO",
+    "CTLP*GREENSBORO VENDIN",
+    "365 MARKET K",  # Vending/convenience at MSU
+]
+
+# Gas station brands; under $30 is a snack run, $30+ is fuel
+GAS_STATION_PATTERNS = [
+    "SHELL",
+    "LOVE'S",
+    "LOVE S",
+    "BUC-EE",
+    "BUCEE",
+    "EXXON",
+    "CHEVRON",
+    "MARATHON",
+    "MURPHY",
+    "QT ",  # QuikTrip
+    "QUIKTRIP",
+    "PILOT",
+    "CIRCLE K",
+    "SPRINT MART",
+    "76 - DEES",
+    "76 DEES",
+    "TEXACO",
+    "BP#",
+    "ON THE WAY",
+]
+
+# Walmart in all its spellings
+WALMART_PATTERNS = [
+    "WALMART",
+    "WAL-MART",
+    "WM SUPERCENTER",
+    "WALMART.COM",
+]
+
+# Books & reading
+BOOKS_PATTERNS = [
+    (["KINDLE"], "Books (Kindle)"),
+    (["MCNALLY JACKSON"], "Books"),
+]
+
+# Streaming & subscriptions
+STREAMING_LABELS = [
+    (["NETFLIX"], "Netflix"),
+    (["DISNEY PLUS", "DISNEY+"], "Disney+"),
+    (["YOUTUBE"], "YouTube Premium"),
+    (["GOOGLE *ONE", "GOOGLE ONE"], "Google One"),
+    (["HINGE"], "Hinge"),
+    (["APPLE.COM"], "Apple"),
+]
+
+# Professional services
+PRO_SERVICES_LABELS = [
+    (["LINKEDIN"], "LinkedIn Premium"),
+    (["STP*V*RESUME", "RESUMEEXAMPLE", "RESUME-EXAMPLE"], "Resume Services"),
+    (["ATLYS"], "Visa Services (Atlys)"),
+    (["MSDPS"], "DMV/DPS"),
+]
+
+# API & cloud costs
+API_LABELS = [
+    (["GOOGLE *CLOUD", "GOOGLE CLOUD"], "API Costs (Google Cloud)"),
+    (["GOOGLE COLAB", "COLAB"], "API Costs (Google Colab)"),
+    (["AWS", "AMAZON WEB SERVICES"], "API Costs (AWS)"),
+    (["ELEVENLABS", "ELEVEN LABS"], "API Costs (ElevenLabs)"),
+]
+
+# Transportation
+TRANSPORT_LABELS = [
+    (["UBER *TRIP"], "Uber Taxi"),
+    (["PAYPAL *LYFT", "LYFT"], "Lyft"),
+    (["MTA*NYCT", "OMNY"], "NYC Transit"),
+    (["BIRD APP"], "Bird Scooter"),
+    (["HNYFERRYIIL", "FERRY"], "Ferry"),
+]
+
+# Clothing & retail
+CLOTHING_LABELS = [
+    (["MARSHALLS"], "Clothes (Marshalls)"),
+    (["CENTURY 21"], "Clothes (Century 21)"),
+    (["H&M "], "Clothes (H&M)"),
+    (["NIKE", "KLARNA*NIKE", "KLARNA* NIKE"], "Clothes (Nike)"),
+    (["FIVE BELOW"], "Five Below"),
+]
+
+# Groceries & supermarkets
+GROCERY_LABELS = [
+    (["KROGER"], "Grocery (Kroger)"),
+    (["ALDI"], "Grocery (Aldi)"),
+    (["PATEL BROTHERS"], "Grocery (Patel Brothers)"),
+    (["B & W DELI"], "Deli/Grocery (NYC)"),
+]
+
+# Other shopping
+SHOPPING_LABELS = [
+    (["DOLLAR-GENERAL", "DOLLAR GENERAL"], "Dollar General"),
+    (["TARGET"], "Target"),
+    (["MICRO CENTER"], "Electronics (Micro Center)"),
+    (["NYC GIFTS"], "NYC Gift Shop"),
+    (["WH SMITH"], "WHSmith (Airport)"),
+    (["BOOTS"], "Boots (UK Pharmacy)"),
+    (["MAFES SALES"], "MSU MAFES Store"),
+    (["NASSAU STREET"], "Nassau Street Store"),
+]
+
+# Services
+SERVICES_LABELS = [
+    (["US MOBILE", "USMOBILE"], "Phone Service"),
+    (["TOGGLE INSURANCE"], "Renters Insurance"),
+    (["MOLINA HEALTH", "AMBETTER", "WELLCARE"], "Health Insurance"),
+    (["UPS STORE"], "Shipping (UPS)"),
+    (["SPORT CLIPS"], "Haircut"),
+    (["COPY COW"], "Printing"),
+    (["PEARSON"], "Textbooks (Pearson)"),
+    (["MSU STUDENT HEALTH"], "MSU Health Center"),
+    (["MSU CAMPUS"], "MSU Campus"),
+    (["HCC MEDICAL", "HCCMEDICAL"], "Medical Payment"),
+    (["MIDTOWN WASH"], "Car Wash"),
+    (["GREENE ST DECK"], "Parking"),
+    (["SOLIDGATE"], "Online Service"),
+    (["BICYCLE REP"], "Bicycle Repair"),
+]
+
+# Travel
+TRAVEL_LABELS = [
+    (["VIRGIN ATLANTIC"], "Flight (Virgin Atlantic)"),
+    (["CHASE TRAVEL", "TRIPCHRG"], "Chase Travel"),
+    (["SUPER 8"], "Hotel (Super 8)"),
+]
+
+# Entertainment
+ENTERTAINMENT_LABELS = [
+    (["UEC THEATRE"], "Movie Theater"),
+    (["TOPGOLF"], "TopGolf"),
+]
+
+# NYC halal restaurants
+HALAL_PATTERNS = ["HALAL", "BARHOSHA", "HOODA", "YASSO", "CAIRO"]
+
+# Restaurant-specific labels (order matters)
+RESTAURANT_LABELS = [
+    # Fast food chains
+    (["WENDYS", "WENDY'S", "WENDY S"], "Wendy's"),
+    (["MCDONALD"], "McDonald's"),
+    (["TACO BELL"], "Taco Bell"),
+    (["BURGER KING"], "Burger King"),
+    (["CHICK-FIL-A", "CHICKFILA", "CHICK FIL"], "Chick-fil-A"),
+    (["RAISING CANE"], "Raising Cane's"),
+    (["COOK OUT", "COOKOUT"], "Cook Out"),
+    (["WAFFLE HOUSE"], "Waffle House"),
+
+    # Casual dining
+    (["CHILIS", "CHILI'S", "CHILI S"], "Chili's"),
+    (["BUFFALO", "BUFFALOWI"], "Buffalo Wild Wings"),
+    (["ANDAMAN THAI"], "Thai Restaurant"),
+    (["TOPGOLF"], "TopGolf"),
+    (["PITA PIT"], "Pita Pit"),
+
+    # Pizza
+    (["DOMINO", "DOMINOS"], "Domino's"),
+    (["PIZZA", "LITTLE ITALY"], "Pizza"),
+
+    # Coffee shops
+    (["STARBUCKS"], "Starbucks"),
+    (["HIGH GROUND COFFEE"], "High Ground Coffee"),
+    (["DUNKIN"], "Dunkin"),
+
+    # Delivery services
+    (["DD *DOORDASH", "DOORDASH"], "DoorDash"),
+    (["GRUBHUB"], "Grubhub"),
+    (["UBER *EATS", "UBER EATS", "UBEREATS", "UBER   *EATS"], "Uber Eats"),
+
+    # Other specific places
+    (["PANDA EXPRESS", "TECH DINING-PANDA"], "Panda Express"),
+    (["BOARDTOWN"], "Boardtown Pies"),
+    (["DAVES DARK HORSE"], "Dave's Dark Horse"),
+    (["TAXI SHOP CAF"], "Taxi Shop Café"),
+    (["RETAG FOOD"], "Food Vendor"),
+]
+
+# Vending merchants that override every other rule, matched literally
+VENDING_FINAL_PATTERNS = [
+    "AMK MSU",
+    "AMK POD",
+    "CTLP",  # All CTLP transactions are vending machines
+    "COCA COLA CLARK",
+    "COCA COLA SOUTH",
+    "365 MARKET K",
+]
+
+@lru_cache(maxsize=None)
+def label_regex(*patterns: str, regex: bool = True) -> str:
+    """Join upper-cased label patterns into one regex alternation; literal patterns are escaped first."""
+    patterns = [pattern.upper() if regex else re.escape(pattern.upper()) for pattern in patterns]
+    return "|".join(f"(?:{pattern})" for pattern in patterns)
+
+
+# Every labeling rule as (patterns, label, condition), in order; the last
+# matching rule wins. The condition, if any, further restricts the rows:
+#   "under_30" / "over_30" - amount below $30 / $30 or more
+#   "amazon_shopping"      - not Prime, Kindle or AWS
+#   "unlabeled"            - no earlier rule changed the label
+#   "not_vending"          - the label so far isn't "Vending Machine"
+LABEL_RULES = [
     # Vending machine patterns (must be processed first, before restaurants)
-    vending_patterns = [
-        "AMK MSU POD UNION",
-        "AMK MSU POD",
-        "AMK POD",
-        "AMK MSU EINSTEINS",
-        "AMK MSU GRIFFIS",
-        "AMK MSU PANDA",  # Campus vending, not Panda Express restaurant
-        "CTLP*REFRESHMENTS INC",
-        "CTLP*REFRESH",
-        "COCA COLA CLARK STARKVIL",
-        "COCA COLA CLARK STARKV",
-        "COCA COLA SOUTH METRO",
-        "CTLP*GREENSBORO VENDIN",
-        "365 MARKET K",  # Vending/convenience at MSU
-    ]
-    
-    for pattern in vending_patterns:
-        mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-        df.loc[mask, "label"] = "Vending Machine"
-    
+    (VENDING_PATTERNS, "Vending Machine", None),
     # SimpleBills = Electricity
-    simplebills_mask = df["description"].str.upper().str.contains("SIMPLEBILLS|SIMPLE BILLS", na=False, regex=True)
-    df.loc[simplebills_mask, "label"] = "Electricity"
-    
-    # Gas Station Indiscretion - multiple gas station brands (for small purchases like snacks/drinks)
-    gas_station_patterns = [
-        "SHELL",
-        "LOVE'S",
-        "LOVE S",
-        "BUC-EE",
-        "BUCEE",
-        "EXXON",
-        "CHEVRON",
-        "MARATHON",
-        "MURPHY",
-        "QT ",  # QuikTrip
-        "QUIKTRIP",
-        "PILOT",
-        "CIRCLE K",
-        "SPRINT MART",
-        "76 - DEES",
-        "76 DEES",
-        "TEXACO",
-        "BP#",
-        "ON THE WAY",
-    ]
-    
-    for pattern in gas_station_patterns:
-        mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-        # Only label as "Gas Station Indiscretion" if amount is under $30
-        # Transactions $30+ are actual fuel fill-ups, label as "Gasoline"
-        df.loc[mask & (df["amount"] < 30), "label"] = "Gas Station Indiscretion"
-        df.loc[mask & (df["amount"] >= 30), "label"] = "Gasoline"
-    
+    (["SIMPLEBILLS|SIMPLE BILLS"], "Electricity", None),
+    # Gas stations: under $30 is a snack run, $30+ is an actual fill-up
+    (GAS_STATION_PATTERNS, "Gas Station Indiscretion", "under_30"),
+    (GAS_STATION_PATTERNS, "Gasoline", "over_30"),
     # Walmart - label all Walmart transactions
-    walmart_patterns = [
-        "WALMART",
-        "WAL-MART",
-        "WM SUPERCENTER",
-        "WALMART.COM",
-    ]
-    
-    for pattern in walmart_patterns:
-        mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-        df.loc[mask, "label"] = "Walmart"
-    
-    # ========== Books & Reading ==========
-    books_patterns = [
-        (["KINDLE"], "Books (Kindle)"),
-        (["MCNALLY JACKSON"], "Books"),
-    ]
-    for patterns, label in books_patterns:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Streaming & Subscriptions ==========
-    streaming_labels = [
-        (["NETFLIX"], "Netflix"),
-        (["DISNEY PLUS", "DISNEY+"], "Disney+"),
-        (["YOUTUBE"], "YouTube Premium"),
-        (["GOOGLE *ONE", "GOOGLE ONE"], "Google One"),
-        (["HINGE"], "Hinge"),
-        (["APPLE.COM"], "Apple"),
-    ]
-    for patterns, label in streaming_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Professional Services ==========
-    pro_services_labels = [
-        (["LINKEDIN"], "LinkedIn Premium"),
-        (["STP*V*RESUME", "RESUMEEXAMPLE", "RESUME-EXAMPLE"], "Resume Services"),
-        (["ATLYS"], "Visa Services (Atlys)"),
-        (["MSDPS"], "DMV/DPS"),
-    ]
-    for patterns, label in pro_services_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== API & Cloud Costs ==========
-    api_labels = [
-        (["GOOGLE *CLOUD", "GOOGLE CLOUD"], "API Costs (Google Cloud)"),
-        (["GOOGLE COLAB", "COLAB"], "API Costs (Google Colab)"),
-        (["AWS", "AMAZON WEB SERVICES"], "API Costs (AWS)"),
-        (["ELEVENLABS", "ELEVEN LABS"], "API Costs (ElevenLabs)"),
-    ]
-    for patterns, label in api_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Transportation ==========
-    transport_labels = [
-        (["UBER *TRIP"], "Uber Taxi"),
-        (["PAYPAL *LYFT", "LYFT"], "Lyft"),
-        (["MTA*NYCT", "OMNY"], "NYC Transit"),
-        (["BIRD APP"], "Bird Scooter"),
-        (["HNYFERRYIIL", "FERRY"], "Ferry"),
-    ]
-    for patterns, label in transport_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Clothing & Retail ==========
-    clothing_labels = [
-        (["MARSHALLS"], "Clothes (Marshalls)"),
-        (["CENTURY 21"], "Clothes (Century 21)"),
-        (["H&M "], "Clothes (H&M)"),
-        (["NIKE", "KLARNA*NIKE", "KLARNA* NIKE"], "Clothes (Nike)"),
-        (["FIVE BELOW"], "Five Below"),
-    ]
-    for patterns, label in clothing_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Groceries & Supermarkets ==========
-    grocery_labels = [
-        (["KROGER"], "Grocery (Kroger)"),
-        (["ALDI"], "Grocery (Aldi)"),
-        (["PATEL BROTHERS"], "Grocery (Patel Brothers)"),
-        (["B & W DELI"], "Deli/Grocery (NYC)"),
-    ]
-    for patterns, label in grocery_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Other Shopping ==========
-    shopping_labels = [
-        (["DOLLAR-GENERAL", "DOLLAR GENERAL"], "Dollar General"),
-        (["TARGET"], "Target"),
-        (["MICRO CENTER"], "Electronics (Micro Center)"),
-        (["NYC GIFTS"], "NYC Gift Shop"),
-        (["WH SMITH"], "WHSmith (Airport)"),
-        (["BOOTS"], "Boots (UK Pharmacy)"),
-        (["MAFES SALES"], "MSU MAFES Store"),
-        (["NASSAU STREET"], "Nassau Street Store"),
-    ]
-    for patterns, label in shopping_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Services ==========
-    services_labels = [
-        (["US MOBILE", "USMOBILE"], "Phone Service"),
-        (["TOGGLE INSURANCE"], "Renters Insurance"),
-        (["MOLINA HEALTH", "AMBETTER", "WELLCARE"], "Health Insurance"),
-        (["UPS STORE"], "Shipping (UPS)"),
-        (["SPORT CLIPS"], "Haircut"),
-        (["COPY COW"], "Printing"),
-        (["PEARSON"], "Textbooks (Pearson)"),
-        (["MSU STUDENT HEALTH"], "MSU Health Center"),
-        (["MSU CAMPUS"], "MSU Campus"),
-        (["HCC MEDICAL", "HCCMEDICAL"], "Medical Payment"),
-        (["MIDTOWN WASH"], "Car Wash"),
-        (["GREENE ST DECK"], "Parking"),
-        (["SOLIDGATE"], "Online Service"),
-        (["BICYCLE REP"], "Bicycle Repair"),
-    ]
-    for patterns, label in services_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Travel ==========
-    travel_labels = [
-        (["VIRGIN ATLANTIC"], "Flight (Virgin Atlantic)"),
-        (["CHASE TRAVEL", "TRIPCHRG"], "Chase Travel"),
-        (["SUPER 8"], "Hotel (Super 8)"),
-    ]
-    for patterns, label in travel_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Entertainment ==========
-    entertainment_labels = [
-        (["UEC THEATRE"], "Movie Theater"),
-        (["TOPGOLF"], "TopGolf"),
-    ]
-    for patterns, label in entertainment_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            df.loc[mask, "label"] = label
-    
-    # ========== Microsoft ==========
-    microsoft_mask = df["description"].str.upper().str.contains("MICROSOFT", na=False)
-    df.loc[microsoft_mask, "label"] = "Microsoft"
-    
-    # ========== Amazon - categorize by type ==========
+    (WALMART_PATTERNS, "Walmart", None),
+    # Books, subscriptions, services, shopping, travel and entertainment tables
+    *((patterns, label, None) for table in (
+        BOOKS_PATTERNS, STREAMING_LABELS, PRO_SERVICES_LABELS, API_LABELS, TRANSPORT_LABELS,
+        CLOTHING_LABELS, GROCERY_LABELS, SHOPPING_LABELS, SERVICES_LABELS, TRAVEL_LABELS,
+        ENTERTAINMENT_LABELS,
+    ) for patterns, label in table),
+    (["MICROSOFT"], "Microsoft", None),
     # Amazon Prime subscriptions (must be before generic Amazon)
-    amazon_prime_mask = df["description"].str.upper().str.contains("AMAZON PRIME", na=False)
-    df.loc[amazon_prime_mask, "label"] = "Amazon Prime"
-    
+    (["AMAZON PRIME"], "Amazon Prime", None),
     # Amazon Marketplace/Shopping (not Prime, not Kindle, not AWS)
-    amazon_shopping_mask = (
-        df["description"].str.upper().str.contains("AMAZON", na=False) & 
-        ~df["description"].str.upper().str.contains("PRIME", na=False) &
-        ~df["description"].str.upper().str.contains("KINDLE", na=False) &
-        ~df["description"].str.upper().str.contains("WEB SERVICES", na=False)
-    )
-    df.loc[amazon_shopping_mask, "label"] = "Amazon Shopping"
-    
-    # ========== Google One-Off ==========
+    (["AMAZON"], "Amazon Shopping", "amazon_shopping"),
     # Generic Google payments (after specific Google services)
-    google_generic_mask = (
-        df["description"].str.upper().str.contains("PAYPAL *GOOGLE", na=False) &
-        (df["label"] == df["category"])  # Only if not already labeled
-    )
-    df.loc[google_generic_mask, "label"] = "Google Services"
-    
-    # ========== Alipay ==========
-    alipay_mask = df["description"].str.upper().str.contains("ALIPAY", na=False)
-    df.loc[alipay_mask, "label"] = "Alipay Transfer"
-    
-    # ========== NYC Halal Restaurants ==========
-    halal_patterns = ["HALAL", "BARHOSHA", "HOODA", "YASSO", "CAIRO"]
-    for pattern in halal_patterns:
-        mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-        df.loc[mask, "label"] = "NYC Halal Food"
-    
-    # ========== Restaurant-specific labels (order matters) ==========
-    restaurant_labels = [
-        # Fast food chains
-        (["WENDYS", "WENDY'S", "WENDY S"], "Wendy's"),
-        (["MCDONALD"], "McDonald's"),
-        (["TACO BELL"], "Taco Bell"),
-        (["BURGER KING"], "Burger King"),
-        (["CHICK-FIL-A", "CHICKFILA", "CHICK FIL"], "Chick-fil-A"),
-        (["RAISING CANE"], "Raising Cane's"),
-        (["COOK OUT", "COOKOUT"], "Cook Out"),
-        (["WAFFLE HOUSE"], "Waffle House"),
-        
-        # Casual dining
-        (["CHILIS", "CHILI'S", "CHILI S"], "Chili's"),
-        (["BUFFALO", "BUFFALOWI"], "Buffalo Wild Wings"),
-        (["ANDAMAN THAI"], "Thai Restaurant"),
-        (["TOPGOLF"], "TopGolf"),
-        (["PITA PIT"], "Pita Pit"),
-        
-        # Pizza
-        (["DOMINO", "DOMINOS"], "Domino's"),
-        (["PIZZA", "LITTLE ITALY"], "Pizza"),
-        
-        # Coffee shops
-        (["STARBUCKS"], "Starbucks"),
-        (["HIGH GROUND COFFEE"], "High Ground Coffee"),
-        (["DUNKIN"], "Dunkin"),
-        
-        # Delivery services
-        (["DD *DOORDASH", "DOORDASH"], "DoorDash"),
-        (["GRUBHUB"], "Grubhub"),
-        (["UBER *EATS", "UBER EATS", "UBEREATS", "UBER   *EATS"], "Uber Eats"),
-        
-        # Other specific places
-        (["PANDA EXPRESS", "TECH DINING-PANDA"], "Panda Express"),
-        (["BOARDTOWN"], "Boardtown Pies"),
-        (["DAVES DARK HORSE"], "Dave's Dark Horse"),
-        (["TAXI SHOP CAF"], "Taxi Shop Café"),
-        (["RETAG FOOD"], "Food Vendor"),
-    ]
+    (["PAYPAL *GOOGLE"], "Google Services", "unlabeled"),
+    (["ALIPAY"], "Alipay Transfer", None),
+    (HALAL_PATTERNS, "NYC Halal Food", None),
+    # Restaurant-specific labels (order matters); never override vending machines
+    *((patterns, label, "not_vending") for patterns, label in RESTAURANT_LABELS),
+]
+
+# Every pattern in LABEL_RULES as one alternation; rows matching none of
+# them keep their category and skip the per-rule passes
+ANY_LABEL_PATTERN = label_regex(*dict.fromkeys(
+    pattern for patterns, _, _ in LABEL_RULES for pattern in patterns
+))
+
+
+def apply_labels(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply custom labels based on merchant patterns."""
+    df = df.copy()
     
-    for patterns, label in restaurant_labels:
-        for pattern in patterns:
-            mask = df["description"].str.upper().str.contains(pattern.upper(), na=False)
-            # Don't override vending machine labels
-            mask = mask & (df["label"] != "Vending Machine")
-            df.loc[mask, "label"] = label
+    # Create a new 'label' column
+    df["label"] = df["category"]  # Default to original category
+    
+    # Normally upper-cased by the loaders while each file's rows were still
+    # hot; derived here for frames that didn't come from them
+    if "desc_up" not in df:
+        df["desc_up"] = upper_descriptions(df["description"])
+    desc_up = df["desc_up"]
     
-    # ========== FINAL PASS: Ensure Vending Machine labels are applied ==========
-    # Re-apply vending machine labels at the end to ensure they're not overwritten
+    # Vending machine labels are re-applied last and always win, so those
+    # rows are settled up front and skipped by every other rule
     # Use regex=False to treat patterns literally (asterisks are part of merchant names)
-    vending_final_patterns = [
-        "AMK MSU",
-        "AMK POD",
-        "CTLP",  # All CTLP transactions are vending machines
-        "COCA COLA CLARK",
-        "COCA COLA SOUTH",
-        "365 MARKET K",
+    vending = desc_up.str.contains(label_regex(*VENDING_FINAL_PATTERNS, regex=False), na=False)
+    df.loc[vending, "label"] = "Vending Machine"
+    
+    # One scan finds the remaining rows any rule can match; the ordered
+    # per-rule passes then only run over those rows
+    matched = ~vending & desc_up.str.contains(ANY_LABEL_PATTERN, na=False)
+    if matched.any():
+        # Merchants recur constantly, so each distinct combination of the
+        # values the rules look at is labeled once and mapped back
+        rows = df[matched].assign(under_30=df["amount"] < 30, over_30=df["amount"] >= 30)
+        key = ["desc_up", "category", "under_30", "over_30"]
+        unique_rows = rows.drop_duplicates(key)
+        label_matched_rows(unique_rows, unique_rows["desc_up"])
+        df.loc[matched, "label"] = rows[key].merge(unique_rows[key + ["label"]], on=key, how="left")["label"].to_numpy()
+    
+    # The upper-cased descriptions are only needed for labeling
+    return df.drop(columns=["desc_up"])
+
+
+def label_matched_rows(df: pd.DataFrame, desc_up: pd.Series):
+    """Run every rule in LABEL_RULES in order, then write the winning labels to df["label"] in one pass."""
+    conds, choices = [], []
+    
+    def current_labels() -> np.ndarray:
+        # The last matching rule wins, so np.select (first match wins) gets them reversed
+        return np.select(conds[::-1], choices[::-1], default=df["label"].to_numpy())
+    
+    @lru_cache(maxsize=None)
+    def contains(*patterns: str) -> np.ndarray:
+        # Scans each pattern set once, even when several rules share it
+        return desc_up.str.contains(label_regex(*patterns), na=False).to_numpy(dtype=bool)
+    
+    amount = df["amount"].to_numpy()
+    for patterns, label, condition in LABEL_RULES:
+        mask = contains(*patterns)
+        if condition == "under_30":
+            mask = mask & (amount < 30)
+        elif condition == "over_30":
+            mask = mask & (amount >= 30)
+        elif condition == "amazon_shopping":
+            mask = mask & ~contains("PRIME") & ~contains("KINDLE") & ~contains("WEB SERVICES")
+        elif condition == "unlabeled" and mask.any():
+            mask = mask & (current_labels() == df["category"].to_numpy())
+        elif condition == "not_vending" and mask.any():
+            mask = mask & (current_labels() != "Vending Machine")
+        conds.append(mask)
+        choices.append(label)
+    
+    df["label"] = current_labels()
+
+
+def find_input_files(csv_path: Path) -> list:
+    """List every bank CSV to load, with its bank and loader."""
+    return [
+        *(("CapitalOne", load_capital_one, f) for f in sorted(csv_path.glob("CapitalOne*.csv"))),
+        *(("Discover", load_discover, f) for f in sorted(csv_path.glob("Discover*.csv"))),
+        *(("Chase", load_chase, f) for f in sorted(csv_path.glob("Chase_Extracted*.csv"))),  # Chase (extracted)
     ]
-    for pattern in vending_final_patterns:
-        mask = df["description"].str.upper().str.contains(pattern.upper(), na=False, regex=False)
-        df.loc[mask, "label"] = "Vending Machine"
-    
-    return df
+
+
+def input_cache_key(csv_path: Path) -> str:
+    """Hash the contents of every input CSV, plus this script (its labeling rules)."""
+    digest = hashlib.sha256(Path(__file__).read_bytes())
+    for _, _, f in find_input_files(csv_path):
+        digest.update(f.name.encode())
+        digest.update(hashlib.sha256(f.read_bytes()).digest())
+    return digest.hexdigest()
 
 
 def merge_all_csvs(csv_dir: str) -> pd.DataFrame:
     """Merge all CSV files into one DataFrame."""
-    csv_path = Path(csv_dir)
-    all_dfs = []
-    
-    # Load CapitalOne
-    capital_one_files = list(csv_path.glob("CapitalOne*.csv"))
-    for f in capital_one_files:
-        print(f"Loading CapitalOne: {f.name}")
-        df = load_capital_one(str(f))
-        all_dfs.append(df)
-        print(f"  Loaded {len(df)} transactions")
+    tasks = find_input_files(Path(csv_dir))
     
-    # Load Discover
-    discover_files = list(csv_path.glob("Discover*.csv"))
-    for f in discover_files:
-        print(f"Loading Discover: {f.name}")
-        df = load_discover(str(f))
-        all_dfs.append(df)
-        print(f"  Loaded {len(df)} transactions")
-    
-    # Load Chase (extracted)
-    chase_files = list(csv_path.glob("Chase_Extracted*.csv"))
-    for f in chase_files:
-        print(f"Loading Chase: {f.name}")
-        df = load_chase(str(f))
-        all_dfs.append(df)
-        print(f"  Loaded {len(df)} transactions")
-    
-    if not all_dfs:
+    if not tasks:
         print("No CSV files found!")
         return pd.DataFrame()
     
+    # The files are independent, so load them concurrently; map keeps their order
+    with ThreadPoolExecutor(max_workers=min(8, len(tasks))) as executor:
+        all_dfs = list(executor.map(lambda task: task[1](str(task[2])), tasks))
+    
+    for (bank, _, f), df in zip(tasks, all_dfs):
+        print(f"Loading {bank}: {f.name}")
+        print(f"  Loaded {len(df)} transactions")
+    
     # Combine all DataFrames
     merged = pd.concat(all_dfs, ignore_index=True)
     
     # Apply labels
     merged = apply_labels(merged)
     
-    # Sort by date
-    merged["date"] = pd.to_datetime(merged["date"])
+    # Sort by date (already parsed by the loaders; formatted only when written)
     merged = merged.sort_values("date")
-    merged["date"] = merged["date"].dt.strftime("%Y-%m-%d")
+    
+    # Low-cardinality text columns repeat a handful of values on every row
+    merged = merged.astype({col: "category" for col in ("card", "label", "category", "source")})
     
     return merged
 
@@ -497,6 +489,14 @@ def main():
     print("Merging All Credit Card Transactions")
     print("=" * 60)
     
+    # Nothing to do if the inputs are unchanged since the last merge
+    output_path = csv_dir / "All_Transactions_Merged.csv"
+    key_path = output_path.with_suffix(CACHE_KEY_SUFFIX)
+    cache_key = input_cache_key(csv_dir)
+    if output_path.exists() and key_path.exists() and key_path.read_text() == cache_key:
+        print(f"Inputs unchanged, keeping {output_path}")
+        return
+    
     # Merge all CSVs
     merged_df = merge_all_csvs(str(csv_dir))
     
@@ -505,12 +505,12 @@ def main():
         return
     
     # Save merged CSV
-    output_path = csv_dir / "All_Transactions_Merged.csv"
-    merged_df.to_csv(output_path, index=False)
+    merged_df.to_csv(output_path, index=False, date_format="%Y-%m-%d")
+    key_path.write_text(cache_key)
     
     print(f"\n{'=' * 60}")
     print(f"Total transactions: {len(merged_df)}")
-    print(f"Date range: {merged_df['date'].min()} to {merged_df['date'].max()}")
+    print(f"Date range: {merged_df['date'].min():%Y-%m-%d} to {merged_df['date'].max():%Y-%m-%d}")
     print(f"Saved to: {output_path}")
     
     # Print label summary
@@ -2,11 +2,15 @@
 Main script to run the complete Phase 1 pipeline.
 1. Extract transactions from Chase PDFs using Gemini
 2. Merge all CSVs (CapitalOne, Discover, Chase)
-3. Generate trip expense diagrams
-4. Generate overall expense diagrams
+3. Generate trip and overall expense diagrams (in parallel)
 """
 
+import os
 import sys
+import json
+import time
+import hashlib
+from multiprocessing import Process
 from pathlib import Path
 
 # Add src to path
@@ -18,6 +22,49 @@ from generate_trip_diagrams import main as generate_trip_diagrams
 from generate_overall_diagrams import main as generate_overall_diagrams
 
 
+# Project paths, resolved once at import
+SRC_DIR = Path(__file__).resolve().parent
+BASE_DIR = SRC_DIR.parent
+MERGED_CSV = BASE_DIR / "csv" / "All_Transactions_Merged.csv"
+
+# Stamp written into a diagram folder after its step succeeds: the hash of
+# the step's inputs and every file the step wrote
+STAMP_NAME = ".phase1_stamp.json"
+
+# Diagram steps, with the script and output folder each one's charts depend on
+DIAGRAM_STEPS = [
+    ("trip", generate_trip_diagrams, SRC_DIR / "generate_trip_diagrams.py", BASE_DIR / "trip_diagrams"),
+    ("overall", generate_overall_diagrams, SRC_DIR / "generate_overall_diagrams.py", BASE_DIR / "overall_diagrams"),
+]
+
+
+def inputs_key(*inputs: Path) -> str:
+    """Hash the contents of a step's input files."""
+    digest = hashlib.sha256()
+    for path in inputs:
+        digest.update(path.read_bytes() if path.exists() else b"")
+    return digest.hexdigest()
+
+
+def outputs_current(output_dir: Path, key: str) -> bool:
+    """Check that output_dir's stamp matches key and every output it lists still exists."""
+    try:
+        stamp = json.loads((output_dir / STAMP_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return False
+    return stamp["key"] == key and all((output_dir / name).exists() for name in stamp["outputs"])
+
+
+def write_stamp(output_dir: Path, key: str, started: float):
+    """Record key and every file written in output_dir since started."""
+    outputs = sorted(
+        path.name for path in output_dir.iterdir()
+        if path.name != STAMP_NAME and path.stat().st_mtime >= started
+    )
+    stamp = {"key": key, "outputs": outputs}
+    (output_dir / STAMP_NAME).write_text(json.dumps(stamp, indent=2), encoding="utf-8")
+
+
 def main():
     """Run the complete Phase 1 pipeline."""
     print("=" * 70)
@@ -27,7 +74,7 @@ def main():
     print("\n" + "=" * 70)
     print("   STEP 1: Extract Chase Transactions from PDFs")
     print("=" * 70 + "\n")
-    extract_chase()
+    extract_chase([])  # Don't parse run_phase1's own arguments
     
     print("\n" + "=" * 70)
     print("   STEP 2: Merge All Transactions")
@@ -35,14 +82,37 @@ def main():
     merge_all()
     
     print("\n" + "=" * 70)
-    print("   STEP 3: Generate Trip Expense Diagrams")
+    print("   STEP 3: Generate Trip & Overall Expense Diagrams")
     print("=" * 70 + "\n")
-    generate_trip_diagrams()
+    # Both only read the merged CSV, so they run side by side; separate
+    # processes rather than threads, as Matplotlib isn't thread-safe
+    steps = []
+    for name, generate, script, output_dir in DIAGRAM_STEPS:
+        key = inputs_key(MERGED_CSV, script)
+        if outputs_current(output_dir, key):
+            print(f"{name.capitalize()} diagrams are up to date, skipping")
+            continue
+        steps.append((generate, output_dir, key))
     
-    print("\n" + "=" * 70)
-    print("   STEP 4: Generate Overall Expense Diagrams")
-    print("=" * 70 + "\n")
-    generate_overall_diagrams()
+    # Each step renders in its own process pool; split the CPUs between the
+    # steps that run so together they don't start two full-width pools
+    max_workers = max(1, (os.cpu_count() or 1) // max(1, len(steps)))
+    steps = [
+        (Process(target=generate, kwargs={"max_workers": max_workers}), output_dir, key)
+        for generate, output_dir, key in steps
+    ]
+    
+    started = time.time() - 1  # File mtimes can lag time.time() slightly
+    for step, _, _ in steps:
+        step.start()
+    for step, output_dir, key in steps:
+        step.join()
+        if step.exitcode == 0:
+            write_stamp(output_dir, key, started)
+    
+    failed = [step for step, _, _ in steps if step.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"{len(failed)} diagram step(s) failed, see the output above")
     
     print("\n" + "=" * 70)
     print("   PHASE 1 COMPLETE!")
@@ -50,7 +120,7 @@ def main():
     print("\nOutput files:")
     print("  - csv/Chase_Extracted_Transactions.csv")
     print("  - csv/All_Transactions_Merged.csv")
-    print("  - trip_diagrams/*.png (trip expense charts)")
+    print("  - trip_diagrams/*.png, *_details.html (trip expense charts and transaction pages)")
     print("  - overall_diagrams/*.png (overall expense analysis)")
 
 
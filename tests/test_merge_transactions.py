@@ -0,0 +1,79 @@
+"""
+Tests for the labeling rules in merge_transactions.
+Run with: python -m unittest discover tests
+"""
+
+import re
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import merge_transactions as mt
+
+
+def example_description(pattern: str) -> str | None:
+    """Build a description the given rule pattern matches, or None if no simple one does."""
+    for alternative in pattern.upper().split("|"):
+        candidates = [
+            alternative,
+            alternative.replace(" *", " "),
+            alternative.replace("*", ""),
+            alternative.replace("+", ""),
+            re.sub(r"[\\^$.+?*()\[\]{}]", "", alternative),
+        ]
+        for candidate in candidates:
+            if re.search(mt.label_regex(pattern), candidate):
+                return candidate
+    return None
+
+
+def rule_examples() -> list[str]:
+    """One example description per pattern in LABEL_RULES."""
+    return [
+        example_description(pattern)
+        for patterns, _, _ in mt.LABEL_RULES
+        for pattern in patterns
+    ]
+
+
+class PrefilterTest(unittest.TestCase):
+    """The prefilter must let through every row some rule could label."""
+
+    def test_every_rule_pattern_is_covered_by_the_prefilter(self):
+        for patterns, label, _ in mt.LABEL_RULES:
+            for pattern in patterns:
+                with self.subTest(label=label, pattern=pattern):
+                    example = example_description(pattern)
+                    self.assertIsNotNone(example, "no example description for this pattern")
+                    self.assertTrue(re.search(mt.ANY_LABEL_PATTERN, example),
+                                    f"{example!r} is not matched by ANY_LABEL_PATTERN")
+
+    def test_prefilter_does_not_change_labels(self):
+        examples = [example for example in rule_examples() if example is not None]
+        df = pd.DataFrame(
+            [
+                {"description": f"XX {example} 123", "amount": amount, "category": "Dining"}
+                for example in examples
+                for amount in (5.0, 50.0)
+            ]
+        )
+        
+        labeled = mt.apply_labels(df)
+        
+        # Every rule over every row, with no prefilter in front
+        unfiltered = df.assign(label=df["category"])
+        desc_up = mt.upper_descriptions(df["description"])
+        mt.label_matched_rows(unfiltered, desc_up)
+        vending = desc_up.str.contains(mt.label_regex(*mt.VENDING_FINAL_PATTERNS, regex=False), na=False)
+        unfiltered.loc[vending, "label"] = "Vending Machine"
+        
+        mismatched = labeled["label"].astype(object) != unfiltered["label"].astype(object)
+        self.assertFalse(mismatched.any(), labeled.loc[mismatched, ["description", "label"]].to_string())
+
+
+if __name__ == "__main__":
+    unittest.main()